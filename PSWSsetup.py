@@ -37,11 +37,14 @@
 04-01-24  Ver 2.26 Added A/D sample rate to Header files
 04-04-24  Ver 2.27 Fixed indent problem on Latitude in header files, also fixed MAGTMP units of uT (not nT) for MAGTMP header file
 05-27-24  Ver 2.28 Added Sdrf directory to G2DATA structure
+10-18-26  Ver 2.29 Read GPS fix from the shared g2gps service instead of opening /dev/ttyS0
+10-18-26  Ver 2.30 GPS query gives up after GPS_timeout seconds instead of waiting forever for a fix
+10-18-26  Ver 2.31 Lat/Lon only taken from the GPS service once they were read with a valid fix
 @author JCGibbons N8OBJ
 """
 
 # Define Software version of this code (so you don't have to search for it in the code!)
-SWVersion = '2.28'
+SWVersion = '2.31'
 
 # Indicate A/D sampple rate in headers
 SampleRate = '8000'
@@ -55,17 +58,15 @@ import subprocess
 from subprocess import Popen, PIPE
 from datetime import datetime
 import sys
+import time
 sys.path.append('.')
 import os.path
 import pigpio
 from smbus2 import SMBus
 
-# Setup GPS port operation
-from serial import Serial
-from pynmeagps import NMEAReader
-
-GPS_port = '/dev/ttyS0'
-GPS_baud_rate = 115200
+# GPS fix is read from the Grape 2 GPS service
+from g2gps import GPSClient
+GPS_timeout = 60 # seconds to wait for a fix and a position read with it
 
 # ~ points to users home directory - usually /home/pi/
 homepath = os.path.expanduser('~')
@@ -551,33 +552,44 @@ GPS_lat=''
 GPS_lon=''
 GPS_elv=''
 
-with Serial(GPS_port, GPS_baud_rate, timeout=3) as stream:
-    nmr = NMEAReader(stream)
-    while missing_data:
-        _, parsed_data = nmr.read()
-        if parsed_data.msgID == "GSA":
-            gps_data["fix"] = parsed_data.navMode
-            gps_data["pdop"] = parsed_data.PDOP
-            GPS_fix = parsed_data.navMode
-            GPS_pdop = parsed_data.PDOP
-            missing_data.discard("fix")
-            missing_data.discard("pdop")
-        elif parsed_data.msgID == "GGA":
-            gps_data["lat"] = parsed_data.lat
-            gps_data["lon"] = parsed_data.lon
-            gps_data["elev"] = parsed_data.alt
-            GPS_lat = parsed_data.lat
-            GPS_lon = parsed_data.lon
-            GPS_elv = parsed_data.alt
-            missing_data.discard("lat")
-            missing_data.discard("lon")
-            missing_data.discard("elev")
+# The GPS service (g2gps.py) owns the GPS port; it is started if not running
+GPS_deadline = time.monotonic() + GPS_timeout
+try:
+    with GPSClient() as gps:
+        while missing_data and time.monotonic() < GPS_deadline:
+            snapshot = gps.read(timeout=3)
+            if snapshot is None:
+                continue
+            if "GSA" in snapshot["seen"] or "TPV" in snapshot["seen"]:
+                GPS_fix = int(snapshot["fix"][0]) if "D" in snapshot["fix"] else 1
+                GPS_pdop = snapshot["pdop"]
+                gps_data["fix"] = GPS_fix
+                gps_data["pdop"] = GPS_pdop
+                missing_data.discard("fix")
+                missing_data.discard("pdop")
+            # GGA is published before the first fix too; only a position
+            # taken with a fix is used, so keep waiting for one
+            if snapshot.get("position_valid"):
+                GPS_lat = snapshot["lat"]
+                GPS_lon = snapshot["lon"]
+                GPS_elv = snapshot["elev"]
+                gps_data["lat"] = GPS_lat
+                gps_data["lon"] = GPS_lon
+                gps_data["elev"] = GPS_elv
+                missing_data.discard("lat")
+                missing_data.discard("lon")
+                missing_data.discard("elev")
+except ConnectionError as ex:
+    print('GPS service not available - ' + str(ex))
+
+if missing_data:
+    print('No GPS ' + ', '.join(sorted(missing_data)) + ' received in ' + str(GPS_timeout) + ' seconds')
 
 # indicate to user if values should be used
 
 BADfix = 0
 
-if (GPS_pdop >= 4):
+if (GPS_pdop == '' or GPS_pdop >= 4):
     PDOPOK = '  PDOP is Lousy - Not recommended to use this GPS location'
     BADfix = 1
 else:
@@ -15,8 +15,8 @@ NODE=`cat /home/pi/PSWS/Sinfo/NodeNum.txt`
 PATTERN=${DATE}T000000Z_${NODE}
 
 # Compress the daily log files for short term storage in Slogs.
+# G2console gzips its own log when it rotates it at midnight.
 /usr/bin/gzip /home/pi/G2DATA/Slogs/${PATTERN}_DC.log
-/usr/bin/gzip /home/pi/G2DATA/Slogs/${PATTERN}_console.log
 /usr/bin/gzip /home/pi/G2DATA/Slogs/${PATTERN}_magdata.log
 
 # Compress the daily data files copied to the Sxfer directory by files2xfer.py.
@@ -24,8 +24,8 @@ PATTERN=${DATE}T000000Z_${NODE}
 
 # Compress the daily log files copied to the Sxfer directory by files2xfer.py.
 # Note: compfiles.stat will be truncated because we are currently redirecting to it.
-/usr/bin/zip ${PATTERN}_logs ${PATTERN}*.log /home/pi/PSWS/Sstat/*.stat
-/usr/bin/rm -f ${PATTERN}*.log
+/usr/bin/zip ${PATTERN}_logs ${PATTERN}*.log ${PATTERN}*.log.gz /home/pi/PSWS/Sstat/*.stat
+/usr/bin/rm -f ${PATTERN}*.log ${PATTERN}*.log.gz
 
 echo Compress files script ended
 
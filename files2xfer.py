@@ -6,11 +6,14 @@ and store the radio filenames for plot generation
 
 Date        Version     Author  Comments
 02-29-24    Ver 1.00    KC3UAX  Initial commit
+10-18-26    Ver 1.01            magtmp flag read through g2flags.CommandFlags
+10-18-26    Ver 1.02            magtmp checked with g2flags.flag_set, no inotify fd left open
 
 """
 import os
 import shutil
 from datetime import datetime, timedelta
+from g2flags import flag_set
 
 
 radio_files = []
@@ -35,9 +38,8 @@ def copy_radio_files(date_str, dest_dir):
 
 
 def copy_mag_files(date_str, dest_dir):
-    semaphore_file = "/home/pi/PSWS/Scmd/magtmp"
     directory = "/home/pi/G2DATA/Smagtmp/"
-    if os.path.exists(semaphore_file):
+    if flag_set("magtmp"):
         # Copy magnetometer file to /G2DATA/Sxfer/
         for file_name in os.listdir(directory):
             if date_str in file_name:
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grape 2 micro-benchmarks for the console and plotting hot paths
+
+Runs on a station or any Linux box with the G2console and g2plot
+dependencies installed. G2console.py is imported from this directory or
+from ondeck/; --ondeck prefers the update waiting in ondeck/.
+
+--save stores the results as a baseline and --compare checks a run against
+one, exiting with status 1 when any benchmark is more than --tolerance
+slower. Save a baseline with the running release, then compare the ondeck
+update on the same Pi before it is installed:
+
+    g2bench.py --save
+    g2bench.py --ondeck --compare
+
+Date        Version     Comments
+10-18-26    Ver 1.00    Initial commit: datamon record decoding
+10-18-26    Ver 1.01    Added min/max aggregation and per-refresh cost
+10-18-26    Ver 1.02    Added widget rendering, g2plot stages and stored baselines
+10-18-26    Ver 1.03    Added g2plot cached read_file
+"""
+import os
+import re
+import sys
+import json
+import timeit
+import argparse
+import platform
+import tempfile
+from collections import deque
+
+import numpy as np
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+ondeck_first = "--ondeck" in sys.argv[1:]
+for path in ([base_dir, os.path.join(base_dir, "ondeck")] if ondeck_first
+             else [os.path.join(base_dir, "ondeck"), base_dir]):
+    sys.path.insert(0, path)
+
+import G2console
+
+version = "1.03"
+
+baseline_path = os.path.join(base_dir, "g2bench.json")
+
+# One record as written by datactrlr once per second
+datamon_line = (
+    '{"ts":"20240501T123456Z","rver":"3.5.12","pver":"2.1.4","radios":['
+    '{"id":"R1","beacon":"WWV5","freq":5000000.123,"ampl":0.012345},'
+    '{"id":"R2","beacon":"WWV10","freq":10000000.456,"ampl":0.023456},'
+    '{"id":"R3","beacon":"WWV15","freq":15000000.789,"ampl":0.000123}],'
+    '"mver":"0.0.4","ltemp":23.5,"rtemp":21.0,"x":12.345,"y":-3.210,"z":45.678,'
+    '"status":[]}\n'
+)
+datamon_nan_line = datamon_line.replace('"rtemp":21.0', '"rtemp":nan')
+
+
+class null_log:
+    def write(self, str):
+        pass
+
+
+def legacy_parse_json(line):
+    # parse_json() as it was in G2console 12.20, without the aggregation
+    try:
+        line = line.strip().replace("\0", "")
+        data = json.loads(
+            line,
+            parse_float=lambda x: x,
+            parse_int=lambda x: x,
+            parse_constant=lambda x: x,
+        )
+        for i in range(3):
+            float(data["radios"][i]["ampl"])
+            float(data["radios"][i]["freq"])
+        for axis in ["x", "y", "z"]:
+            float(data[axis])
+        return data
+    except Exception:
+        line = re.sub(r"(-?nan|-?inf|null)", "0.0", line)
+        return json.loads(
+            line,
+            parse_float=lambda x: x,
+            parse_int=lambda x: x,
+            parse_constant=lambda x: x,
+        )
+
+
+class legacy_min_max:
+    # DailyMinMaxCollection as it was in G2console 12.21
+    def __init__(self, max_elements=24):
+        self.collection = deque(maxlen=max_elements)
+
+    def update_bounds(self, current_value, timestamp):
+        if timestamp[11:15] == "0000" or len(self.collection) == 0:
+            self.collection.append(
+                {"max": current_value, "current": current_value, "min": current_value}
+            )
+        else:
+            self.collection[-1]["current"] = current_value
+            if abs(current_value) > abs(self.collection[-1]["max"]):
+                self.collection[-1]["max"] = current_value
+            if abs(current_value) < abs(self.collection[-1]["min"]):
+                self.collection[-1]["min"] = current_value
+
+    def get_daily_max(self, mode):
+        if not self.collection:
+            return None
+        if mode == G2console.MODE_DAILY:
+            return max(
+                ((h["max"], abs(h["max"])) for h in self.collection), key=lambda x: x[1]
+            )[0]
+        return self.collection[-1]["max"]
+
+    def get_daily_min(self, mode):
+        if not self.collection:
+            return None
+        if mode == G2console.MODE_DAILY:
+            return min(
+                ((h["min"], abs(h["min"])) for h in self.collection), key=lambda x: x[1]
+            )[0]
+        return self.collection[-1]["min"]
+
+    def get_current(self):
+        if not self.collection:
+            return None
+        return self.collection[-1]["current"]
+
+
+def legacy_refresh(collections):
+    # each widget evaluated every value twice: once for None, once to format
+    mode = G2console.MODE_DAILY
+    for c in collections:
+        if c.get_daily_max(mode) != None:
+            c.get_daily_max(mode)
+        if c.get_daily_min(mode) != None:
+            c.get_daily_min(mode)
+        if c.get_current() != None:
+            c.get_current()
+
+
+def refresh(collections):
+    mode = G2console.MODE_DAILY
+    for c in collections:
+        c.get_snapshot(mode)
+
+
+def fill_hours(collections, hours):
+    for hour in range(hours):
+        for second in range(3600):
+            ts = f"20240501T{hour:02d}{second // 60:02d}{second % 60:02d}Z"
+            for c in collections:
+                c.update_bounds((second % 97) - 48.5, ts)
+
+
+def decode_only(line):
+    record = G2console.decode_datamon(line.strip().replace("\0", ""))
+    for i in range(3):
+        record.ampl[i]
+        record.freq[i]
+    return record
+
+
+def run(name, func, number, repeat=5):
+    usec = min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+    print(f"{name:<40} {usec:10.2f} us")
+    return usec
+
+
+def bench_datamon(number):
+    print("Datamon record decoding")
+    results = {}
+    for label, line in (("finite", datamon_line), ("nan", datamon_nan_line)):
+        legacy = run(f"  legacy parse_json ({label})", lambda: legacy_parse_json(line), number)
+        fast = run(f"  decode_datamon ({label})", lambda: decode_only(line), number)
+        print(f"  {'speedup':<38} {legacy / fast:10.1f} x")
+        results[f"datamon_{label}"] = fast
+    return results
+
+
+def bench_min_max(number):
+    print("Min/max aggregation (9 collections, as in the console)")
+    results = {}
+    for label, cls in (("legacy", legacy_min_max), ("ring", G2console.DailyMinMaxCollection)):
+        collections = [cls() for _ in range(9)]
+        fill_hours(collections, 1)
+        results[f"update_{label}"] = run(
+            f"  update_bounds x9 ({label})",
+            lambda: [c.update_bounds(1.5, "20240501T001234Z") for c in collections],
+            number,
+        )
+        refresh_func = legacy_refresh if cls is legacy_min_max else refresh
+        for hours in (1, 24):
+            collections = [cls() for _ in range(9)]
+            fill_hours(collections, hours)
+            results[f"refresh_{label}_{hours}h"] = run(
+                f"  per-refresh, {hours:2d} hours ({label})",
+                lambda: refresh_func(collections),
+                number,
+            )
+    return {key: results[key] for key in results if "ring" in key}
+
+
+class fake_screen:
+    # The parts of a curses window the print_* renderers use.
+    def __init__(self, rows=60, cols=100):
+        self.size = (rows, cols)
+        self.writes = 0
+
+    def getmaxyx(self):
+        return self.size
+
+    def addstr(self, y, x, string):
+        self.writes += 1
+
+
+def render_frame(stdscr, data):
+    # what console_loop draws when a new record arrives
+    G2console.print_version(stdscr, 2, data)
+    G2console.print_gps_time(stdscr, 5)
+    G2console.print_gps(stdscr, 7)
+    G2console.print_beacon(stdscr, 13, data)
+    G2console.print_ampl(stdscr, 16)
+    G2console.print_freq(stdscr, 21)
+    G2console.print_temp(stdscr, 26, data)
+    G2console.print_mag(stdscr, 29)
+
+
+def bench_widgets(number):
+    print("Widget rendering (fake curses screen)")
+    results = {}
+    data = None
+    for second in range(4 * 3600):
+        ts = f"20240501T{second // 3600:02d}{second // 60 % 60:02d}{second % 60:02d}Z"
+        data = G2console.parse_json(datamon_line.replace("20240501T123456Z", ts))
+    stdscr = fake_screen()
+
+    def changed():
+        G2console.screen_cells.clear()
+        render_frame(stdscr, data)
+
+    results["frame_changed"] = run("  full frame, every cell changed", changed, number)
+    results["frame_cached"] = run(
+        "  full frame, no cell changed", lambda: render_frame(stdscr, data), number
+    )
+    G2console.show_stats = True
+    results["frame_stats"] = run("  full frame, mean/std/slope", changed, number)
+    G2console.show_stats = False
+    results["sparklines"] = run(
+        "  sparklines, 4 hours",
+        lambda: G2console.print_sparklines(stdscr, 40),
+        max(1, number // 100),
+    )
+    return results
+
+
+def write_radio_day(path, rows=86400):
+    # A synthetic SdataR* file in the datactrlr format: metadata line, comment
+    # lines, column header and one row per second of the UTC day.
+    rng = np.random.default_rng(1)
+    seconds = np.arange(rows)
+    freq = 10e6 + 0.3 * np.sin(2 * np.pi * seconds / 86400) + rng.normal(0, 0.05, rows)
+    vrms = 0.02 * (1.5 + np.sin(2 * np.pi * seconds / 86400)) * rng.uniform(0.8, 1.2, rows)
+    with open(path, "w") as file:
+        file.write(
+            "#,2024-05-01T00:00:00Z,N0000001,EN91fh,41.4,-81.8,300,Cleveland OH,G2R1,WWV10\n"
+        )
+        file.write("# synthetic day written by g2bench\n")
+        file.write("UTC,Freq,Vrms\n")
+        file.writelines(
+            f"2024-05-01T{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}Z,{f:.3f},{v:.6f}\n"
+            for s, f, v in zip(seconds.tolist(), freq.tolist(), vrms.tolist())
+        )
+
+
+def bench_plot(number):
+    import g2plot
+    import matplotlib.pyplot as plt
+
+    print("g2plot stages, one 86,400 row radio day")
+    results = {}
+    number = max(1, number // 20000)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_file = os.path.join(tmp_dir, "2024-05-01T000000Z_N0000001_G2R1_RAWDATA.csv")
+        write_radio_day(data_file)
+        g2plot.args = argparse.Namespace(grid=False, xfer=False, cache=False)
+        g2plot.plot_dir = tmp_dir + "/"
+        g2plot.cache_dir = tmp_dir + "/Scache/"
+        stdout = sys.stdout
+        # g2plot prints its progress; keep only the timings
+        quiet = open(os.devnull, "w")
+
+        def stage(name, func, setup=lambda: None):
+            def timed():
+                args = setup()
+                sys.stdout = quiet
+                try:
+                    start = timeit.default_timer()
+                    func(*(args or ()))
+                    return timeit.default_timer() - start
+                finally:
+                    sys.stdout = stdout
+                    plt.close("all")
+
+            usec = min(sum(timed() for _ in range(number)) for _ in range(3)) / number * 1e6
+            print(f"  {name:<38} {usec:10.0f} us")
+            results[name.split()[0]] = usec
+
+        def processed():
+            data, metadata = g2plot.read_file(data_file, cache=False)
+            sys.stdout = quiet
+            g2plot.process_data(data)
+            sys.stdout = stdout
+            return data, 10e6
+
+        stage("read_file", g2plot.read_file, lambda: (data_file, False))
+        g2plot.read_file(data_file)  # marks the file read
+        g2plot.read_file(data_file)  # writes the cache
+        stage("read_file_cached", g2plot.read_file, lambda: (data_file,))
+        stage(
+            "process_data",
+            g2plot.process_data,
+            lambda: (g2plot.read_file(data_file, cache=False)[0],),
+        )
+        stage("create_filter", g2plot.create_filter, processed)
+        stage("create_radio_plot_file (one PNG)", g2plot.create_radio_plot_file, lambda: (data_file,))
+        quiet.close()
+    return results
+
+
+def save_baseline(path, results):
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "host": platform.node(),
+                "g2bench": version,
+                "console": G2console.version,
+                "results": results,
+            },
+            file,
+            indent=1,
+        )
+    print(f"Baseline saved to {path}")
+
+
+def compare_baseline(path, results, tolerance):
+    # Returns the names of the benchmarks more than tolerance slower.
+    with open(path) as file:
+        baseline = json.load(file)
+    if baseline["host"] != platform.node():
+        print(f"Warning: baseline was measured on {baseline['host']}")
+    print(f"Against console {baseline['console']} baseline (tolerance {tolerance:.0%})")
+    slower = []
+    for name, usec in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        ratio = usec / before
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  SLOWER"
+            slower.append(name)
+        print(f"  {name:<38} {ratio:10.2f} x{flag}")
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grape 2 Benchmarks")
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=f"%(prog)s v{version}",
+        help="show g2bench version",
+    )
+    parser.add_argument(
+        "-n", "--number", help="iterations per measurement", type=int, default=20000
+    )
+    parser.add_argument(
+        "suites", help="datamon, minmax, widgets and/or plot (default all)", nargs="*"
+    )
+    parser.add_argument(
+        "--ondeck", help="benchmark ondeck/G2console.py", action="store_true"
+    )
+    parser.add_argument(
+        "--save", help="store the results as a baseline", nargs="?", const=baseline_path
+    )
+    parser.add_argument(
+        "--compare", help="compare with a stored baseline", nargs="?", const=baseline_path
+    )
+    parser.add_argument(
+        "--tolerance", help="allowed slowdown before failing", type=float, default=0.15
+    )
+    args = parser.parse_args()
+
+    suites = {
+        "datamon": bench_datamon,
+        "minmax": bench_min_max,
+        "widgets": bench_widgets,
+        "plot": bench_plot,
+    }
+    for name in args.suites:
+        if name not in suites:
+            parser.error(f"unknown benchmark {name}")
+    G2console.log = null_log()
+    print(f"G2console {G2console.version} from {G2console.__file__}")
+    results = {}
+    for name in args.suites or suites:
+        results.update(suites[name](args.number))
+    if args.save:
+        save_baseline(args.save, results)
+    if args.compare and compare_baseline(args.compare, results, args.tolerance):
+        sys.exit(1)
+    sys.exit(0)
@@ -7,6 +7,12 @@
 #LOG=/home/pi/PSWS/Sstat/g2cstart.stat
 G2C=G2console
 G2CARG=$1
+HEADLESS=''
+if [[ " $* " == *" --headless "* ]]
+then
+    HEADLESS='--headless'   # no curses; state served on localhost (see G2console -h)
+    [ "$G2CARG" == '--headless' ] && G2CARG=''
+fi
 SCMD=/home/pi/PSWS/Scmd
 G2User=/home/pi/G2User
 G2DATA=/home/pi/G2DATA
@@ -64,7 +70,7 @@ STARTCON=true
 while $STARTCON
 do
     echo "`date +%Y-%m-%dT%H:%M:%S` $G2C starting"
-    /usr/bin/python3 $G2User/G2console.py $G2CARG
+    /usr/bin/python3 $G2User/G2console.py $G2CARG $HEADLESS
     code=$?
     if [[ $code == 5 || $code == 6 ]]
     then
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grape 2 command flag watcher
+
+Command flags are empty semaphore files in /home/pi/PSWS/Scmd, e.g.
+restartcon (restart G2console for updates), magtmp (magnetometer enabled),
+NBF (new beacon frequencies), noswap (preswap.sh already ran) and gpsubx
+(g2gps uses UBX NAV-PVT instead of NMEA).
+
+CommandFlags keeps the set of flags present in memory and updates it from
+inotify events, so a flag can be tested on every loop iteration without
+touching the filesystem and a new flag is seen within milliseconds. Where
+inotify is not available the directory is rescanned every poll_interval
+seconds instead.
+
+Shell scripts can wait for a flag with:  g2flags.py wait restartcon
+
+Date        Version     Comments
+10-18-26    Ver 1.00    Initial commit
+10-18-26    Ver 1.01    Added gpsubx
+10-18-26    Ver 1.02    flag_set() for a one-time check without inotify
+"""
+import os
+import sys
+import time
+import ctypes
+import struct
+import select
+import argparse
+
+version = "1.02"
+
+cmd_dir = "/home/pi/PSWS/Scmd"
+flag_names = ("restartcon", "magtmp", "NBF", "noswap", "gpsubx")
+
+# from <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def flag_set(name, directory=cmd_dir):
+    """One-time check of a flag, for scripts that only test it once."""
+    return os.path.exists(os.path.join(directory, name))
+
+
+class CommandFlags:
+    def __init__(self, directory=cmd_dir, names=flag_names, poll_interval=1.0):
+        self.directory = directory
+        self.names = frozenset(names)
+        self.poll_interval = poll_interval
+        self.flags = set()
+        self.fd = None  # inotify fd, None when polling
+        self.last_scan = 0.0
+        self.watch()
+        self.scan()
+
+    def watch(self):
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        mask = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), mask) < 0:
+            os.close(fd)  # directory missing; poll until it exists
+            return
+        self.fd = fd
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def fileno(self):
+        """inotify fd for use with select/selectors, or None when polling."""
+        return self.fd
+
+    def scan(self):
+        self.last_scan = time.monotonic()
+        try:
+            present = set(os.listdir(self.directory)) & self.names
+        except OSError:
+            present = set()
+        changes = [(name, True) for name in present - self.flags]
+        changes += [(name, False) for name in self.flags - present]
+        self.flags = present
+        return changes
+
+    def update(self, timeout=0):
+        """Apply pending flag changes, waiting up to timeout seconds for one.
+
+        Returns a list of (name, present) tuples.
+        """
+        if self.fd is None:
+            if time.monotonic() - self.last_scan < self.poll_interval:
+                if not timeout:
+                    return []
+                time.sleep(min(timeout, self.poll_interval))
+            self.watch()
+            return self.scan()
+        if timeout and not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return []
+        changes = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = IN_EVENT.unpack_from(data, offset)
+            offset += IN_EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    self.close()  # directory went away, fall back to polling
+                return changes + self.scan()
+            if name not in self.names:
+                continue
+            present = bool(mask & (IN_CREATE | IN_MOVED_TO))
+            if present != (name in self.flags):
+                if present:
+                    self.flags.add(name)
+                else:
+                    self.flags.discard(name)
+                changes.append((name, present))
+        return changes
+
+    def is_set(self, name):
+        self.update()
+        return name in self.flags
+
+    def clear(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+        self.flags.discard(name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grape 2 Command Flags")
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=f"%(prog)s v{version}",
+        help="show g2flags version",
+    )
+    parser.add_argument("-d", "--dir", help="command flag directory", default=cmd_dir)
+    parser.add_argument(
+        "-t", "--timeout", help="give up after this many seconds", type=float, default=None
+    )
+    parser.add_argument("action", choices=["list", "wait"])
+    parser.add_argument("flag", nargs="?", help="flag to wait for")
+    args = parser.parse_args()
+
+    names = flag_names if args.flag is None else flag_names + (args.flag,)
+    flags = CommandFlags(args.dir, names)
+    if args.action == "list":
+        print(" ".join(sorted(flags.flags)))
+        sys.exit(0)
+
+    if args.flag is None:
+        parser.error("wait needs a flag name")
+    deadline = None if args.timeout is None else time.monotonic() + args.timeout
+    while not flags.is_set(args.flag):
+        remaining = 1.0 if deadline is None else deadline - time.monotonic()
+        if remaining <= 0:
+            sys.exit(1)
+        flags.update(min(remaining, 1.0))
+    sys.exit(0)
@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grape 2 GPS service
+
+Owns the UBLOX GPS serial port (or the gpsd connection when gpsd is running),
+parses the GGA, GSA and ZDA sentences once and publishes the latest fix
+snapshot to any number of clients over a Unix socket. G2console, gpstst and
+PSWSsetup are clients, so they no longer compete for /dev/ttyS0.
+
+The serial stream is read in bulk and framed by GPSStreamParser in a single
+pass: sentences with a bad checksum are dropped and only the types used here
+are split into fields. With --ubx (or the gpsubx command flag) the receiver
+is switched to the binary UBX NAV-PVT message, which carries the whole fix
+in one 100 byte frame, and the GGA, GSA and ZDA sentences are turned off
+until the service exits.
+
+Each snapshot is sent as one line of JSON with the keys of the console's
+gps_data dictionary plus "seen", the sentence types received so far, and
+"position_valid", set once lat/lon/elev have been taken while the receiver
+reported a fix. A new client gets the current snapshot as soon as it
+connects.
+
+The service is started on demand by the first GPSClient and exits once it
+has had no clients for idle_timeout seconds, or as soon as g2gps.py itself
+is replaced, so the next client starts the updated version. Its stderr goes to
+g2gps.stat next to the socket, and a service that fails to open the port
+exits with status 1, which GPSClient.connect reports. For testing without hardware,
+point --port at the slave side of a pty and write NMEA into the master
+(--wait covers a pty that is created later, as g2replay.py does), or point
+--gpsd at a local socket that speaks the gpsd JSON protocol.
+
+Date        Version     Comments
+10-18-26    Ver 1.00    Initial commit, serial and gpsd readers moved from G2console
+10-18-26    Ver 1.01    Own NMEA/UBX stream parser replaces pynmeagps, optional UBX NAV-PVT
+10-18-26    Ver 1.02    One persistent gpsd subscription with merged TPV/SKY reports
+10-18-26    Ver 1.03    GPSClient.fileno() and non-blocking read(timeout=0)
+10-18-26    Ver 1.04    Restore NMEA output after UBX mode on idle exit and SIGTERM
+10-18-26    Ver 1.05    GGA published without a fix, service errors kept in Sstat/g2gps.stat
+10-18-26    Ver 1.06    --wait for a serial port that does not exist yet, e.g. a g2replay pty
+10-18-26    Ver 1.07    Clients dropped after a short write instead of getting half a line
+10-18-26    Ver 1.08    position_valid flag, service exits when g2gps.py is updated
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import struct
+import signal
+import socket
+import psutil
+import argparse
+import selectors
+import threading
+import subprocess
+from subprocess import DEVNULL
+from functools import reduce
+from operator import xor
+from serial import Serial
+from gpsdclient import GPSDClient
+from g2flags import flag_set
+
+version = "1.08"
+
+socket_path = "/home/pi/PSWS/Sstat/g2gps.sock"
+service_file = os.path.abspath(__file__)
+
+
+def new_snapshot():
+    return {
+        "time": "00:00:00",
+        "day": "00",
+        "month": "00",
+        "year": "0000",
+        "lat": 0.0,
+        "lon": 0.0,
+        "elev": 0.0,
+        "pdop": 0.0,
+        "fix": "0",
+        "nsats": 0,
+        "seen": [],
+        "position_valid": False,  # lat/lon/elev were taken with a 2D/3D fix
+    }
+
+
+def source_stamp():
+    try:
+        return os.stat(service_file).st_mtime_ns
+    except OSError:
+        return None
+
+
+def is_process_running(process_name):
+    for process in psutil.process_iter(["pid", "name"]):
+        if process.info["name"] == process_name:
+            return True
+    return False
+
+
+def ubx_frame(msg_class, msg_id, payload=b""):
+    body = struct.pack("<BBH", msg_class, msg_id, len(payload)) + payload
+    return b"\xb5\x62" + body + ubx_checksum(body)
+
+
+def ubx_checksum(body):
+    # 8-bit Fletcher over class, id, length and payload
+    ck_a = ck_b = 0
+    for byte in body:
+        ck_a = (ck_a + byte) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return bytes((ck_a, ck_b))
+
+
+def ubx_set_rate(msg_class, msg_id, rate):
+    # short CFG-MSG: output rate on the port the command arrives on
+    return ubx_frame(0x06, 0x01, bytes((msg_class, msg_id, rate)))
+
+
+UBX_NAV_PVT = (0x01, 0x07)
+NMEA_OFF = ((0xF0, 0x00), (0xF0, 0x02), (0xF0, 0x08))  # GGA, GSA, ZDA
+NAV_PVT = struct.Struct("<I H B B B B B B I i B B B B i i i i I I i i i i i I I H")
+
+
+def nmea_degrees(value, hemisphere):
+    # ddmm.mmmm / dddmm.mmmm to signed decimal degrees
+    point = value.find(b".")
+    degrees = float(value[: point - 2]) + float(value[point - 2 :]) / 60
+    return -degrees if hemisphere in (b"S", b"W") else degrees
+
+
+class GPSStreamParser:
+    """Frames NMEA sentences and UBX messages out of a receiver byte stream.
+
+    feed() takes whatever the port returned and yields complete frames in a
+    single pass over the buffer: ("NMEA", "GGA", fields) for the sentence
+    types in wanted, with the talker removed and fields as bytes, and
+    ("UBX", (class, id), payload). Frames with a bad checksum are counted in
+    errors and skipped; partial frames wait for the next feed().
+    """
+
+    max_sentence = 120  # NMEA allows 82
+    max_ubx = 1024
+
+    def __init__(self, wanted=(b"GGA", b"GSA", b"ZDA")):
+        self.wanted = frozenset(wanted)
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        pos = 0
+        end_of_data = len(buffer)
+        while pos < end_of_data:
+            nmea = buffer.find(b"$", pos)
+            ubx = buffer.find(b"\xb5\x62", pos)
+            if nmea < 0 and ubx < 0:
+                # keep a trailing 0xb5, it may start a UBX frame
+                pos = end_of_data - 1 if buffer.endswith(b"\xb5") else end_of_data
+                break
+            if ubx < 0 or 0 <= nmea < ubx:
+                end = buffer.find(b"\n", nmea, nmea + self.max_sentence)
+                if end < 0:
+                    if end_of_data - nmea < self.max_sentence:
+                        pos = nmea  # incomplete, wait for more
+                        break
+                    pos = nmea + 1  # no end of line, not a sentence
+                    continue
+                restart = buffer.find(b"$", nmea + 1, end)
+                if restart >= 0:
+                    self.errors += 1  # truncated sentence
+                    pos = restart
+                    continue
+                pos = end + 1
+                sentence = bytes(buffer[nmea + 1 : end]).rstrip(b"\r")
+                if len(sentence) < 9 or sentence[-3] != 0x2A:  # "*"
+                    self.errors += 1
+                    continue
+                msg_id = sentence[2:5]
+                if msg_id not in self.wanted:
+                    continue
+                body = sentence[:-3]
+                try:
+                    checksum = int(sentence[-2:], 16)
+                except ValueError:
+                    checksum = -1
+                if reduce(xor, body, 0) != checksum:
+                    self.errors += 1
+                    continue
+                yield "NMEA", msg_id.decode(), body.split(b",")
+            else:
+                if end_of_data - ubx < 6:
+                    pos = ubx
+                    break
+                length = buffer[ubx + 4] | buffer[ubx + 5] << 8
+                if length > self.max_ubx:
+                    self.errors += 1
+                    pos = ubx + 2
+                    continue
+                if end_of_data - ubx < length + 8:
+                    pos = ubx
+                    break
+                body = bytes(buffer[ubx + 2 : ubx + 6 + length])
+                if ubx_checksum(body) != buffer[ubx + 6 + length : ubx + 8 + length]:
+                    self.errors += 1
+                    pos = ubx + 2
+                    continue
+                pos = ubx + 8 + length
+                yield "UBX", (body[0], body[1]), body[4:]
+        del buffer[:pos]
+
+
+class GPSService:
+    def __init__(
+        self,
+        port,
+        baud_rate,
+        socket_path,
+        idle_timeout=30.0,
+        ubx=False,
+        gpsd_address=("127.0.0.1", 2947),
+        port_wait=0.0,
+    ):
+        self.port = port
+        self.gpsd_address = gpsd_address
+        self.baud_rate = baud_rate
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.ubx = ubx
+        self.port_wait = port_wait  # seconds to wait for the port to appear
+        self.snapshot = new_snapshot()
+        self.line = b""  # last published snapshot, sent to new clients
+        self.clients = []
+        self.lock = threading.Lock()
+        self.exited = False
+        self.error = None  # why the reader stopped, if it failed
+        self.ready = threading.Event()  # set once the port is open
+        self.reader_thread = None
+
+    def publish(self, msg_id):
+        if msg_id not in self.snapshot["seen"]:
+            self.snapshot["seen"] = self.snapshot["seen"] + [msg_id]
+        line = (json.dumps(self.snapshot) + "\n").encode()
+        with self.lock:
+            self.line = line
+            for client in list(self.clients):
+                self.send(client, line)
+
+    def send(self, client, line):
+        # Clients that can't keep up with one line per sentence are dropped,
+        # also after a short write, so no client ever sees half a line.
+        try:
+            if client.send(line) == len(line):
+                return
+        except OSError:
+            pass
+        self.clients.remove(client)
+        client.close()
+
+    def serial_reader(self):
+        parser = GPSStreamParser()
+        gsa_sats = None  # satellites counted so far in a run of GSA sentences
+
+        deadline = time.monotonic() + self.port_wait
+        while not os.path.exists(self.port) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        with Serial(self.port, self.baud_rate, timeout=1) as stream:
+            self.ready.set()
+            if self.ubx:
+                self.configure_ubx(stream, True)
+            try:
+                while not self.exited:
+                    data = stream.read(max(1, stream.in_waiting))
+                    for kind, msg_id, frame in parser.feed(data):
+                        if kind == "UBX":
+                            if msg_id == UBX_NAV_PVT:
+                                self.nav_pvt(frame)
+                            continue
+                        if msg_id != "GSA" and gsa_sats is not None:
+                            # one GSA per constellation; the run has ended
+                            self.snapshot["nsats"] = gsa_sats
+                            gsa_sats = None
+                            self.publish("GSA")
+                        try:
+                            if msg_id == "GSA":
+                                gsa_sats = (gsa_sats or 0) + self.gsa(frame)
+                            elif msg_id == "GGA":
+                                self.gga(frame)
+                            else:
+                                self.zda(frame)
+                        except (ValueError, IndexError) as ex:
+                            print(f"Bad {msg_id} sentence: {ex}", file=sys.stderr)
+            finally:
+                if self.ubx:
+                    self.configure_ubx(stream, False)
+
+    def configure_ubx(self, stream, enable):
+        # NAV-PVT replaces the three NMEA sentences; undone when the service exits
+        stream.write(ubx_set_rate(*UBX_NAV_PVT, 1 if enable else 0))
+        for msg_class, msg_id in NMEA_OFF:
+            stream.write(ubx_set_rate(msg_class, msg_id, 0 if enable else 1))
+        stream.flush()
+
+    def gga(self, fields):
+        # published without a fix too, so clients can tell "no fix" from "no GGA"
+        gps_data = self.snapshot
+        if "D" in gps_data["fix"] and fields[2] and fields[4]:
+            gps_data["lat"] = nmea_degrees(fields[2], fields[3])
+            gps_data["lon"] = nmea_degrees(fields[4], fields[5])
+            gps_data["elev"] = float(fields[9]) if fields[9] else 0.0
+            gps_data["position_valid"] = True
+        self.publish("GGA")
+
+    def gsa(self, fields):
+        gps_data = self.snapshot
+        gps_data["pdop"] = float(fields[15]) if fields[15] else 0.0
+        nav_mode = fields[2]
+        gps_data["fix"] = nav_mode.decode() + "D" if nav_mode in (b"2", b"3") else "0"
+        self.publish("GSA")
+        return sum(1 for svid in fields[3:15] if svid)
+
+    def zda(self, fields):
+        gps_data = self.snapshot
+        if "D" not in gps_data["fix"]:
+            return
+        hhmmss = fields[1].decode()
+        gps_data["time"] = f"{hhmmss[0:2]}:{hhmmss[2:4]}:{hhmmss[4:6]}"
+        gps_data["day"] = str(int(fields[2]))
+        gps_data["month"] = str(int(fields[3]))
+        gps_data["year"] = str(int(fields[4]))
+        self.publish("ZDA")
+
+    def nav_pvt(self, payload):
+        if len(payload) < NAV_PVT.size:
+            return
+        pvt = NAV_PVT.unpack_from(payload)
+        year, month, day, hour, minute, second = pvt[1:7]
+        fix_type, num_sv = pvt[10], pvt[13]
+        gps_data = self.snapshot
+        gps_data["fix"] = "3D" if fix_type in (3, 4) else "2D" if fix_type == 2 else "0"
+        gps_data["nsats"] = num_sv
+        gps_data["pdop"] = pvt[27] * 0.01
+        if "D" in gps_data["fix"]:
+            gps_data["lon"] = pvt[14] * 1e-7
+            gps_data["lat"] = pvt[15] * 1e-7
+            gps_data["elev"] = pvt[17] * 1e-3  # height above mean sea level, as GGA
+            gps_data["position_valid"] = True
+            gps_data["time"] = f"{hour:02d}:{minute:02d}:{second:02d}"
+            gps_data["day"] = str(day)
+            gps_data["month"] = str(month)
+            gps_data["year"] = str(year)
+        self.publish("TPV")
+
+    def gpsd_reader(self):
+        # One gpsd subscription for the life of the service. TPV and SKY
+        # reports are merged into the snapshot as they arrive, so a fix is
+        # published at the receiver's rate; the stream is only reopened if
+        # gpsd goes away.
+        self.ready.set()
+        while not self.exited:
+            try:
+                with GPSDClient(*self.gpsd_address, timeout=5.0) as client:
+                    for report in client.dict_stream(convert_datetime=False, filter=["TPV", "SKY"]):
+                        if report["class"] == "TPV":
+                            self.tpv(report)
+                        else:
+                            self.sky(report)
+                        if self.exited:
+                            return
+                print("gpsd closed the connection", file=sys.stderr)
+            except OSError as ex:
+                print("Exception in gpsd_reader: " + str(ex), file=sys.stderr)
+            time.sleep(2.0)
+
+    def tpv(self, report):
+        gps_data = self.snapshot
+        fix_quality = report.get("mode", 0)
+        gps_data["fix"] = f"{fix_quality}D" if fix_quality in (2, 3) else "0"
+        gps_data["lat"] = report.get("lat", 0.0)
+        gps_data["lon"] = report.get("lon", 0.0)
+        gps_data["elev"] = report.get("altMSL", report.get("alt", 0.0))
+        gps_data["position_valid"] = "D" in gps_data["fix"] and "lat" in report
+        timestamp = report.get("time", "")  # e.g. 2024-05-01T12:34:56.000Z
+        if len(timestamp) >= 19:
+            gps_data["time"] = timestamp[11:19]
+            gps_data["day"] = str(int(timestamp[8:10]))
+            gps_data["month"] = str(int(timestamp[5:7]))
+            gps_data["year"] = timestamp[0:4]
+        self.publish("TPV")
+
+    def sky(self, report):
+        gps_data = self.snapshot
+        if "pdop" in report:
+            gps_data["pdop"] = report["pdop"]
+        if "uSat" in report:
+            gps_data["nsats"] = report["uSat"]
+        elif "satellites" in report:
+            gps_data["nsats"] = sum(1 for sat in report["satellites"] if sat.get("used"))
+        self.publish("SKY")
+
+    def reader(self):
+        try:
+            if self.port is None:
+                self.gpsd_reader()
+            else:
+                self.serial_reader()
+        except Exception as ex:
+            self.error = str(ex)
+            print("Exception in GPS reader: " + str(ex), file=sys.stderr)
+        finally:
+            self.exited = True
+            self.ready.set()
+
+    def serve(self):
+        # The socket is only bound once the port is open, so a client never
+        # connects to a service that is about to fail.
+        self.reader_thread = threading.Thread(target=self.reader, daemon=True)
+        self.reader_thread.start()
+        self.ready.wait()
+        if self.exited:
+            return
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # left behind by a service that died
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o666)
+        server.listen()
+        selector = selectors.DefaultSelector()
+        selector.register(server, selectors.EVENT_READ)
+
+        idle_since = time.monotonic()
+        source_mtime = source_stamp()
+        try:
+            while not self.exited:
+                if selector.select(1.0):
+                    client, _ = server.accept()
+                    client.setblocking(False)
+                    with self.lock:
+                        self.clients.append(client)
+                        if self.line:
+                            self.send(client, self.line)
+                with self.lock:
+                    for client in list(self.clients):
+                        # a readable client socket has hung up
+                        try:
+                            if client.recv(1, socket.MSG_PEEK) == b"":
+                                self.clients.remove(client)
+                                client.close()
+                        except BlockingIOError:
+                            pass
+                        except OSError:
+                            self.clients.remove(client)
+                            client.close()
+                    if self.clients:
+                        idle_since = time.monotonic()
+                if self.idle_timeout and time.monotonic() - idle_since > self.idle_timeout:
+                    break
+                if source_stamp() != source_mtime:
+                    # g2cstart.sh moved in an update; clients reconnect and
+                    # start the new version
+                    print("g2gps.py has changed, exiting", file=sys.stderr)
+                    break
+        finally:
+            self.exited = True
+            server.close()
+            os.remove(self.socket_path)
+            with self.lock:
+                for client in self.clients:
+                    client.close()
+                self.clients = []
+            # the serial read times out every second; the reader then
+            # restores the receiver's NMEA output before the process exits
+            self.reader_thread.join(5.0)
+
+
+class GPSClient:
+    """Subscriber to the GPS service, which is started if it is not running."""
+
+    def __init__(self, path=socket_path, start=True):
+        self.path = path
+        self.start = start
+        self.stat_path = os.path.join(os.path.dirname(path), "g2gps.stat")
+        self.sock = None
+        self.buffer = b""
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connect(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        service = None
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                self.sock = sock
+                self.buffer = b""
+                return
+            except OSError:
+                sock.close()
+                if not self.start or time.monotonic() > deadline:
+                    raise ConnectionError(f"GPS service not available on {self.path}")
+            if service is None:
+                with open(self.stat_path, "w") as stat_file:
+                    service = subprocess.Popen(
+                        [sys.executable, service_file, "--socket", self.path],
+                        stdin=DEVNULL,
+                        stdout=DEVNULL,
+                        stderr=stat_file,
+                        start_new_session=True,
+                    )
+            elif service.poll():
+                # exit status 0 means another instance holds the port
+                raise ConnectionError("GPS service failed: " + self.service_error())
+            time.sleep(0.2)
+
+    def service_error(self):
+        try:
+            with open(self.stat_path) as stat_file:
+                lines = stat_file.read().strip().splitlines()
+        except OSError:
+            lines = []
+        return lines[-1] if lines else f"see {self.stat_path}"
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read(self, timeout=None):
+        """Return the latest snapshot, or None if none arrived within timeout.
+
+        timeout=0 never blocks, for use from an event loop. Raises
+        ConnectionError when the service goes away.
+        """
+        if self.sock is None:
+            self.connect()
+        self.sock.settimeout(timeout)
+        while b"\n" not in self.buffer:
+            try:
+                chunk = self.sock.recv(4096)
+            except (socket.timeout, BlockingIOError):
+                return None
+            if not chunk:
+                self.close()
+                raise ConnectionError("GPS service closed the connection")
+            self.buffer += chunk
+        lines = self.buffer.split(b"\n")
+        self.buffer = lines[-1]
+        return json.loads(lines[-2])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grape 2 GPS Service")
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=f"%(prog)s v{version}",
+        help="show g2gps version",
+    )
+    parser.add_argument(
+        "-p",
+        "--port",
+        help="GPS serial port (default /dev/ttyS0, or gpsd when it is running)",
+        default=None,
+    )
+    parser.add_argument(
+        "-g",
+        "--gpsd",
+        help="read from gpsd at host:port instead of the serial port",
+        default=None,
+    )
+    parser.add_argument("-b", "--baud", help="serial baud rate", type=int, default=115200)
+    parser.add_argument("-s", "--socket", help="service socket path", default=socket_path)
+    parser.add_argument(
+        "-u",
+        "--ubx",
+        help="switch the receiver to UBX NAV-PVT output (also set by the gpsubx flag)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-w",
+        "--wait",
+        help="wait up to this many seconds for the serial port to appear",
+        type=float,
+        default=0.0,
+    )
+    parser.add_argument(
+        "-i",
+        "--idle",
+        help="exit after this many seconds without clients (0 = never)",
+        type=float,
+        default=30.0,
+    )
+    args = parser.parse_args()
+
+    # Only one service may own the port; a second instance exits quietly.
+    lock = open(os.path.join(os.path.dirname(args.socket), "g2gps.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        sys.exit(0)
+
+    port = args.port
+    gpsd_address = ("127.0.0.1", 2947)
+    if args.gpsd is not None:
+        host, _, gpsd_port = args.gpsd.rpartition(":")
+        gpsd_address = (host or "127.0.0.1", int(gpsd_port))
+    elif port is None and not is_process_running("gpsd"):
+        port = "/dev/ttyS0"
+    ubx = args.ubx or flag_set("gpsubx")
+    service = GPSService(port, args.baud, args.socket, args.idle, ubx, gpsd_address, args.wait)
+    # SIGTERM unwinds serve() like an idle exit, so the UBX settings are undone
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    service.serve()
+    sys.exit(0 if service.error is None else 1)
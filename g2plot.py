@@ -27,15 +27,30 @@ Date        Version     Author      Comments
 04-29-24    Ver 4.2     KC3UAX      Added rolling average and remote temp
 05-22-24    Ver 5.0     KC3UAX      Added plotting 3 mag components separately
 05-23-24    Ver 5.1     KC3UAX      Modifed magnetometer plots: font size, added mean to legend
+10-18-26    Ver 5.2                 Vectorized UTC conversion, malformed UTC rows dropped
+10-18-26    Ver 5.3                 Added --jobs to plot files in worker processes
+10-18-26    Ver 5.4                 Each plot is encoded once, then written or hardlinked to Splot and Sxfer
+10-18-26    Ver 5.5                 One reusable figure per plot type instead of a new pyplot figure per file
+10-18-26    Ver 5.6                 Typed column schema for read_file, UTC converted while the file is read
+10-18-26    Ver 5.7                 Binary cache of finished daily files in Scache, added --no-cache
+10-18-26    Ver 5.8                 Cache only re-read files, prune Scache, discard unreadable cache files
+10-18-26    Ver 5.9                 --jobs 0 sizes the worker pool from available memory
 """
 import os
+import io
 import sys
+import json
+import time
+import traceback
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 import warnings
 from scipy import signal
 import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import argparse
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -43,7 +58,7 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 matplotlib.use("Agg")
 plt.rcParams["font.size"] = 13
 
-version = "5.1"
+version = "5.9"
 
 
 # ~ points to users home directory - usually /home/pi/
@@ -55,6 +70,14 @@ plot_dir = home_path + "Splot/"
 # transfer directory  (files to be sent to server node)
 xfer_dir = home_path + "Sxfer/"
 
+# cache of parsed daily files, see read_file
+cache_dir = home_path + "Scache/"
+cache_format = 1  # bump when the cached columns change
+
+# memory to leave for each --jobs 0 worker, about 200 MB RSS plus headroom
+worker_memory = 300 * 1024 * 1024
+cache_days = 30  # cache files not used for this many days are removed
+
 beacon_frequencies = {
     "WWV2p5": ("2.5 MHz", "WWV"),
     "WWV5": ("5 MHz", "WWV"),
@@ -78,27 +101,223 @@ def time_string_to_decimals(time_string):  # returns float decimal hours
     return hours + minutes + seconds
 
 
-def read_file(data_file: str):
+utc_width = len("2024-05-01T12:34:56Z")
+
+# Columns read from each type of file and their types. UTC is not in the
+# schema: read_file converts it to decimal hours from the raw bytes.
+radio_columns = {"Freq": np.float64, "Vrms": np.float64}
+mag_columns = {
+    "RemTmp C": np.float64,
+    "Mx(uT)": np.float64,
+    "My(uT)": np.float64,
+    "Mz(uT)": np.float64,
+}
+
+
+def fixed_width_decimals(byte_at, terminator):
+    # byte_at(i) returns byte i of every UTC timestamp, up to the byte after
+    # it, which must be terminator. Returns decimal hours, with the same
+    # float operations as time_string_to_decimals so the hours are
+    # identical, and which rows were fixed width (the others are NaN).
+    digits = np.stack([byte_at(i) - ord("0") for i in (11, 12, 14, 15, 17, 18)], axis=1)
+    fixed = (
+        (digits <= 9).all(axis=1)  # non-digits wrap past 9
+        & (byte_at(13) == ord(":"))
+        & (byte_at(16) == ord(":"))
+        & (byte_at(19) == ord("Z"))
+        & (byte_at(utc_width) == terminator)
+    )
+    hours = np.full(len(fixed), np.nan)
+    d = digits[fixed].astype(np.float64)
+    hours[fixed] = (d[:, 0] * 10 + d[:, 1]) + (d[:, 2] * 10 + d[:, 3]) / 60.0 + (
+        d[:, 4] * 10 + d[:, 5]
+    ) / 3600.0
+    return hours, fixed
+
+
+def utc_to_decimals(utc: pd.Series):  # returns float decimal hours, NaN if malformed
+    # Fixed-width UTC strings are converted in bulk from their digit bytes.
+    # Any other row goes through time_string_to_decimals.
+    try:
+        raw = np.asarray(utc, dtype=f"S{utc_width + 1}")
+    except (UnicodeEncodeError, ValueError):
+        raw = None
+    if raw is not None:
+        chars = raw.view(np.uint8).reshape(len(raw), utc_width + 1)
+        hours, fixed = fixed_width_decimals(lambda i: chars[:, i], 0)
+    else:
+        hours = np.full(len(utc), np.nan)
+        fixed = np.zeros(len(utc), dtype=bool)
+    for row in np.flatnonzero(~fixed):
+        try:
+            hours[row] = time_string_to_decimals(utc.iloc[row])
+        except (TypeError, ValueError, IndexError):
+            pass
+    return hours
+
+
+def raw_utc_decimals(raw: bytes, rows: int):
+    # Decimal hours from the first field of each data line of the file, or
+    # None when UTC isn't the first column or the lines don't match the rows
+    # pandas read. Data lines are the ones pandas keeps with comment="#":
+    # not empty, not starting with "#", after the column header.
+    chars = np.frombuffer(raw, dtype=np.uint8)
+    starts = np.flatnonzero(chars == ord("\n")) + 1
+    starts = np.concatenate(([0], starts[starts < len(chars)]))
+    first = chars[starts]
+    starts = starts[(first != ord("#")) & (first != ord("\n")) & (first != ord("\r"))]
+    if len(starts) != rows + 1 or raw[starts[0] : starts[0] + 4] != b"UTC,":
+        return None
+    starts = starts[1:]
+    if rows and starts[-1] + utc_width >= len(chars):
+        return None
+    hours, fixed = fixed_width_decimals(lambda i: chars[starts + i], ord(","))
+    for row in np.flatnonzero(~fixed):
+        start = starts[row]
+        try:
+            hours[row] = time_string_to_decimals(raw[start : raw.index(b",", start)].decode())
+        except (ValueError, IndexError, UnicodeDecodeError):
+            pass
+    return hours
+
+
+def parse_file(data_file: str):
+    # Only the columns the plots use are parsed, with declared types, from
+    # one read of the file. UTC comes back as decimal hours, NaN where it
+    # couldn't be parsed.
     metadata = {}
-    with open(data_file, "r") as file:
-        header = file.readline().strip().split(",")
-        metadata["UTCDTZ"] = header[1].replace(":", "")
-        metadata["UTC_DT"] = header[1][:10]
-        metadata["Node"] = header[2]
-        metadata["GridSqr"] = header[3]
-        metadata["Lat"] = header[4]
-        metadata["Long"] = header[5]
-        metadata["Elev"] = header[6]
-        metadata["CityState"] = header[7]
-        if "MAGTMP" not in data_file:
-            metadata["RadioID"] = header[8]
-            metadata["Beacon"] = header[9]
-        data = pd.read_csv(file, comment="#")
+    with open(data_file, "rb") as file:
+        raw = file.read()
+    header = raw.split(b"\n", 1)[0].decode().strip().split(",")
+    metadata["UTCDTZ"] = header[1].replace(":", "")
+    metadata["UTC_DT"] = header[1][:10]
+    metadata["Node"] = header[2]
+    metadata["GridSqr"] = header[3]
+    metadata["Lat"] = header[4]
+    metadata["Long"] = header[5]
+    metadata["Elev"] = header[6]
+    metadata["CityState"] = header[7]
+    if "MAGTMP" not in data_file:
+        metadata["RadioID"] = header[8]
+        metadata["Beacon"] = header[9]
+    columns = mag_columns if "MAGTMP" in data_file else radio_columns
+    data = pd.read_csv(
+        io.BytesIO(raw), comment="#", usecols=list(columns), dtype=columns, engine="c"
+    )
+    hours = raw_utc_decimals(raw, len(data))
+    if hours is None:
+        utc = pd.read_csv(io.BytesIO(raw), comment="#", usecols=["UTC"], dtype=object)
+        hours = utc_to_decimals(utc["UTC"])
+    data.insert(0, "UTC", hours)
+    return data, metadata
+
+
+def cache_key(data_file: str):
+    stat = os.stat(data_file)
+    return np.array([cache_format, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def load_cache(cache_file: str, key):
+    # (data, metadata) from an uncompressed .npz written by save_cache, or
+    # None if it is missing or for another version of the file. A file that
+    # can't be read (truncated by a power cut, say) is removed.
+    try:
+        with np.load(cache_file, allow_pickle=False) as cache:
+            if not np.array_equal(cache["key"], key):
+                return None
+            metadata = json.loads(str(cache["metadata"]))
+            columns = [str(column) for column in cache["columns"]]
+            data = pd.DataFrame({column: cache[f"column{i}"] for i, column in enumerate(columns)})
+    except FileNotFoundError:
+        return None
+    except Exception as ex:
+        print("Removing unreadable cache file", cache_file, ex)
+        with contextlib.suppress(OSError):
+            os.remove(cache_file)
+        return None
+    with contextlib.suppress(OSError):
+        os.utime(cache_file)  # last use, for prune_cache
+    return data, metadata
+
+
+def save_cache(cache_file: str, key, data: pd.DataFrame, metadata):
+    arrays = {f"column{i}": data[column].to_numpy() for i, column in enumerate(data.columns)}
+    temp_file = cache_file + ".tmp"
+    try:
+        with open(temp_file, "wb") as cache:
+            np.savez(
+                cache,
+                key=key,
+                metadata=np.array(json.dumps(metadata)),
+                columns=np.array(list(data.columns)),
+                **arrays,
+            )
+            cache.flush()
+            os.fsync(cache.fileno())
+        os.replace(temp_file, cache_file)
+    except OSError as ex:
+        print("Cache not written: ", ex)
+
+
+def first_read(seen_file: str):
+    # True the first time a file is read, when an empty marker is left in
+    # cache_dir; also True when the marker can't be written.
+    try:
+        os.makedirs(os.path.dirname(seen_file), exist_ok=True)
+        with open(seen_file, "x"):
+            pass
+    except FileExistsError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def prune_cache(days=cache_days):
+    # remove cache files and markers not used for days
+    cutoff = time.time() - days * 86400
+    try:
+        entries = list(os.scandir(cache_dir))
+    except OSError:
+        return
+    for entry in entries:
+        with contextlib.suppress(OSError):
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+
+
+def read_file(data_file: str, cache=True):
+    # With cache, a finished daily file (one from before today, UTC) that is
+    # read a second time is kept in cache_dir as a binary copy of its
+    # columns, which later reads load at disk speed. Most files are only
+    # plotted once, the day after, so the first read leaves just a marker.
+    # The copy is keyed by the size and modification time of data_file, so
+    # a changed file is parsed again.
+    if not cache or cache_dir is None:
+        return parse_file(data_file)
+    cache_file = cache_dir + os.path.basename(data_file) + ".npz"
+    key = cache_key(data_file)
+    cached = load_cache(cache_file, key)
+    if cached is not None:
+        return cached
+    data, metadata = parse_file(data_file)
+    if metadata["UTC_DT"] < time.strftime("%Y-%m-%d", time.gmtime()):
+        seen_file = cache_dir + os.path.basename(data_file) + ".seen"
+        if not first_read(seen_file):
+            save_cache(cache_file, key, data, metadata)
+            with contextlib.suppress(OSError):
+                os.remove(seen_file)
     return data, metadata
 
 
 def process_data(data: pd.DataFrame):
-    data["UTC"] = data["UTC"].apply(lambda x: time_string_to_decimals(x))
+    if not pd.api.types.is_float_dtype(data["UTC"]):
+        data["UTC"] = utc_to_decimals(data["UTC"])
+    malformed = data["UTC"].isna()
+    if malformed.any():
+        # a NaN would spread through the whole filtered trace
+        print("Malformed UTC rows dropped: ", malformed.sum())
+        data.drop(data.index[malformed], inplace=True)
     if any("Mx" in col for col in data.columns):
         # if any column contains Mag (for Magnetometer)
         data["B(nT)"] = (
@@ -136,37 +355,122 @@ def create_filter(data: pd.DataFrame, beacon_freq):
     return filt_doppler, filt_power
 
 
-def plot_radio_data(data, filt_doppler, filt_power, metadata):
-    ##%% modified from "Double-y axis plot,
-    ## http://kitchingroup.cheme.cmu.edu/blog/2013/09/13/Plotting-two-datasets-with-very-different-scales/
+def write_file(path: str, data):
+    # written under a temporary name and renamed, so the uploader never sees
+    # a partial PNG
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def link_file(source: str, path: str):
+    temp_path = path + ".tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    os.link(source, temp_path)
+    os.replace(temp_path, path)
+
+
+def save_plot(fig: Figure, graph_file: str):
+    # Rasterize and PNG-encode the figure once. Sxfer gets a hardlink to the
+    # Splot file when both are on the same filesystem, else a copy of the
+    # same bytes.
+    png = io.BytesIO()
+    fig.savefig(png, format="png", dpi=100, orientation="landscape")
+    plot_graph_file = plot_dir + graph_file
+    write_file(plot_graph_file, png.getbuffer())
+    print("Plot saved to", plot_dir)
+    if args.xfer:
+        xfer_graph_file = xfer_dir + graph_file
+        try:
+            link_file(plot_graph_file, xfer_graph_file)
+        except OSError:
+            write_file(xfer_graph_file, png.getbuffer())
+        print("Plot saved to", xfer_dir)
+
 
+# Figures are built once per plot type, with their axes, labels, ticks and
+# limits, and kept for the whole run. Each file only swaps in its line data,
+# legend and title, so plotting more files doesn't use more memory. They are
+# plain Figures, not pyplot figures, so pyplot holds no reference to them.
+figure_templates = {}
+
+
+def day_figure():
     # set up x-axis with time
-    fig = plt.figure(figsize=(19, 10))  # inches x, y with 72 dots per inch
+    fig = Figure(figsize=(19, 10))  # inches x, y with 72 dots per inch
     ax1 = fig.add_subplot(111)
-    ax1.plot(data["UTC"], filt_doppler, "k")  # color k for black
     ax1.set_xlabel("UTC Hour")
-    ax1.set_ylabel("Doppler shift, Hz")
     ax1.set_xlim(0, 24)  # UTC day
     ax1.set_xticks(range(25), minor=False)
-    ax1.set_ylim([-1.5, 1.5])  # -1.5 to 1.5 Hz for Doppler shift
     if args.grid:
-        print("Grid enabled")
         ax1.grid(axis="x")
+    return fig, ax1
+
+
+def radio_figure():
+    ##%% modified from "Double-y axis plot,
+    ## http://kitchingroup.cheme.cmu.edu/blog/2013/09/13/Plotting-two-datasets-with-very-different-scales/
+    fig, ax1 = day_figure()
+    doppler = ax1.plot([], [], "k")[0]  # color k for black
+    ax1.set_ylabel("Doppler shift, Hz")
+    ax1.set_ylim([-1.5, 1.5])  # -1.5 to 1.5 Hz for Doppler shift
     # plot a zero freq reference line for 0.000 Hz Doppler shift
-    plt.axhline(y=0, color="gray", lw=1)
+    ax1.axhline(y=0, color="gray", lw=1)
     # set up axis 2 in red
     ax2 = ax1.twinx()
-    ax2.plot(data["UTC"], filt_power, "r-")  # NOTE: Set for filtered version
+    power = ax2.plot([], [], "r-")[0]  # NOTE: Set for filtered version
     ax2.set_ylabel("dBVrms", color="r")
     ax2.set_ylim(-160, 0)  # Try these as defaults to keep graphs similar.
-    for tl in ax2.get_yticklabels():
-        tl.set_color("r")
+    ax2.tick_params(axis="y", labelcolor="r")
+    return {"fig": fig, "ax1": ax1, "ax2": ax2, "lines": (doppler, power)}
+
+
+def component_mag_figure():
+    fig, ax1 = day_figure()
+    lines = tuple(ax1.plot([], [], color)[0] for color in ("k", "r", "b"))
+    ax1.set_ylabel("∆B(nT)")
+    return {"fig": fig, "ax1": ax1, "lines": lines}
+
+
+def composite_mag_figure():
+    fig, ax1 = day_figure()
+    composite = ax1.plot([], [], "k")[0]  # color k for black
+    ax1.set_ylabel("B(nT)")
+    ax2 = ax1.twinx()
+    temperature = ax2.plot([], [], "r-")[0]  # NOTE: Set for filtered version
+    ax2.set_ylabel("Remote Temperature (C)", color="r")
+    ax2.tick_params(axis="y", labelcolor="r")
+    return {"fig": fig, "ax1": ax1, "ax2": ax2, "lines": (composite, temperature)}
+
+
+def figure_template(name: str):
+    if name not in figure_templates:
+        figure_templates[name] = globals()[name + "_figure"]()
+    return figure_templates[name]
+
+
+def autoscale_y(*axes):
+    # what plot() does for new lines, redone for the swapped data
+    for ax in axes:
+        ax.relim()
+        ax.autoscale_view(scalex=False)
+
+
+def plot_radio_data(data, filt_doppler, filt_power, metadata):
+    template = figure_template("radio")
+    if args.grid:
+        print("Grid enabled")
+    doppler, power = template["lines"]
+    doppler.set_data(data["UTC"].to_numpy(), filt_doppler)
+    power.set_data(data["UTC"].to_numpy(), filt_power)
 
     freq, label = beacon_frequencies[metadata["Beacon"]]
     print(f"Final Plot for Decoded {freq} {label} Beacon")
     beacon_label = f"{label} {freq}"
 
-    plt.title(
+    template["ax2"].set_title(
         beacon_label
         + " Doppler Shift Plot\nNode:  "
         + metadata["Node"]
@@ -182,6 +486,7 @@ def plot_radio_data(data, filt_doppler, filt_power, metadata):
         + metadata["UTC_DT"]
         + "  UTC"
     )
+    return template["fig"]
 
 
 def plot_component_mag_data(data: pd.DataFrame, metadata):
@@ -210,23 +515,20 @@ def plot_component_mag_data(data: pd.DataFrame, metadata):
         z_centered.max(),
     )    
     
-    # set up x-axis with time
-    fig = plt.figure(figsize=(19, 10))  # inches x, y with 72 dots per inch
-    ax1 = fig.add_subplot(111)
-    ax1.plot(data["UTC"], x_centered, "k", label=f"Bx (Mean: {round(xmean*1000)}nT)")  # color k for black
-    ax1.plot(data["UTC"], y_centered, "r", label=f"By (Mean: {round(ymean*1000)}nT)")  # color k for black
-    ax1.plot(data["UTC"], z_centered, "b", label=f"Bz (Mean: {round(zmean*1000)}nT)")  # color k for black
-    ax1.legend() 
-    ax1.set_xlabel("UTC Hour")
-    ax1.set_ylabel("∆B(nT)")
-    ax1.set_xlim(0, 24)  # UTC day
-    ax1.set_xticks(range(25), minor=False)
-    # ax.set_ylim([-1.5, 1.5])
+    template = figure_template("component_mag")
+    ax1 = template["ax1"]
+    utc = data["UTC"].to_numpy()
+    for line, axis, centered, mean in zip(
+        template["lines"], "xyz", (x_centered, y_centered, z_centered), (xmean, ymean, zmean)
+    ):
+        line.set_data(utc, centered.to_numpy())
+        line.set_label(f"B{axis} (Mean: {round(mean*1000)}nT)")
+    ax1.legend()
+    autoscale_y(ax1)
     if args.grid:
         print("Grid enabled")
-        ax1.grid(axis="x")
 
-    plt.title(
+    ax1.set_title(
         "Magnetometer Plot (Component)\nNode:  "
         + metadata["Node"]
         + "     Gridsquare:  "
@@ -250,17 +552,10 @@ def plot_component_mag_data(data: pd.DataFrame, metadata):
         + metadata["GridSqr"]
         + "_MAGTMP_COMPONENT.png"
     )
-    plot_graph_file = plot_dir + graph_file
-    xfer_graph_file = xfer_dir + graph_file
-
     print("Plot File: " + graph_file)  # indicate plot file name for crontab printout
 
     # create plot
-    plt.savefig(plot_graph_file, dpi=100, orientation="landscape")
-    print("Plot saved to", plot_dir)
-    if args.xfer:
-        plt.savefig(xfer_graph_file, dpi=100, orientation="landscape")
-        print("Plot saved to", xfer_dir)
+    save_plot(template["fig"], graph_file)
 
     print()
 
@@ -269,29 +564,16 @@ def plot_composite_mag_data(data: pd.DataFrame, metadata):
     composite_mag = data["B(nT)"].rolling(60).mean()
     print("Composite mag min: ", composite_mag.min(), "; Composite mag max: ", composite_mag.max())
     
-    # set up x-axis with time
-    fig = plt.figure(figsize=(19, 10))  # inches x, y with 72 dots per inch
-    ax1 = fig.add_subplot(111)
-    ax1.plot(data["UTC"], composite_mag, "k")  # color k for black
-    ax1.set_xlabel("UTC Hour")
-    ax1.set_ylabel("B(nT)")
-    ax1.set_xlim(0, 24)  # UTC day
-    ax1.set_xticks(range(25), minor=False)
-    # ax.set_ylim([-1.5, 1.5])
+    template = figure_template("composite_mag")
+    composite, temperature = template["lines"]
+    utc = data["UTC"].to_numpy()
+    composite.set_data(utc, composite_mag.to_numpy())
+    temperature.set_data(utc, data["RemTmp C"].rolling(120).mean().to_numpy())
+    autoscale_y(template["ax1"], template["ax2"])
     if args.grid:
         print("Grid enabled")
-        ax1.grid(axis="x")
-
-    ax2 = ax1.twinx()
-    ax2.plot(
-        data["UTC"], data["RemTmp C"].rolling(120).mean(), "r-"
-    )  # NOTE: Set for filtered version
-    ax2.set_ylabel("Remote Temperature (C)", color="r")
-    # ax2.set_ylim(-160, 0)
-    for tl in ax2.get_yticklabels():
-        tl.set_color("r")
 
-    plt.title(
+    template["ax2"].set_title(
         "Magnetometer Plot (Composite)\nNode:  "
         + metadata["Node"]
         + "     Gridsquare:  "
@@ -315,21 +597,14 @@ def plot_composite_mag_data(data: pd.DataFrame, metadata):
         + metadata["GridSqr"]
         + "_MAGTMP_COMPOSITE.png"
     )
-    plot_graph_file = plot_dir + graph_file
-    xfer_graph_file = xfer_dir + graph_file
-
     print("Plot File: " + graph_file)  # indicate plot file name for crontab printout
 
     # create plot
-    plt.savefig(plot_graph_file, dpi=100, orientation="landscape")
-    print("Plot saved to", plot_dir)
-    if args.xfer:
-        plt.savefig(xfer_graph_file, dpi=100, orientation="landscape")
-        print("Plot saved to", xfer_dir)
+    save_plot(template["fig"], graph_file)
 
 
 def create_radio_plot_file(data_file: str):
-    data, metadata = read_file(data_file)
+    data, metadata = read_file(data_file, args.cache)
 
     print("Ready to start processing records")
     process_data(data)
@@ -337,7 +612,7 @@ def create_radio_plot_file(data_file: str):
     filt_doppler, filt_power = create_filter(
         data, float(beacon_frequencies[metadata["Beacon"]][0].split()[0]) * 10**6
     )
-    plot_radio_data(data, filt_doppler, filt_power, metadata)
+    fig = plot_radio_data(data, filt_doppler, filt_power, metadata)
 
     graph_file = (
         metadata["UTCDTZ"]
@@ -351,21 +626,14 @@ def create_radio_plot_file(data_file: str):
         + metadata["Beacon"]
         + "_graph.png"
     )
-    plot_graph_file = plot_dir + graph_file
-    xfer_graph_file = xfer_dir + graph_file
-
     print("Plot File: " + graph_file)  # indicate plot file name for crontab printout
 
     # create plot
-    plt.savefig(plot_graph_file, dpi=100, orientation="landscape")
-    print("Plot saved to", plot_dir)
-    if args.xfer:
-        plt.savefig(xfer_graph_file, dpi=100, orientation="landscape")
-        print("Plot saved to", xfer_dir)
+    save_plot(fig, graph_file)
 
 
 def create_mag_plot_file(data_file: str):
-    data, metadata = read_file(data_file)
+    data, metadata = read_file(data_file, args.cache)
 
     print("Ready to start processing records")
     process_data(data)
@@ -376,6 +644,74 @@ def create_mag_plot_file(data_file: str):
     plot_component_mag_data(data, metadata)
 
 
+def plot_file(file: str, capture=False):
+    # Returns (printed output or None, traceback or None). One bad file
+    # doesn't stop the others; with capture, a worker's output is returned
+    # so it can be printed in input order.
+    output = io.StringIO() if capture else sys.stdout
+    error = None
+    with contextlib.redirect_stdout(output):
+        print("Input file:", file)
+        try:
+            if "MAGTMP" in file:
+                create_mag_plot_file(file)
+            else:
+                create_radio_plot_file(file)
+        except Exception:
+            error = traceback.format_exc()
+    return (output.getvalue() if capture else None), error
+
+
+def init_worker(worker_args):
+    global args
+    args = worker_args
+
+
+def auto_jobs():
+    # One worker per worker_memory of MemAvailable, at most one per CPU: each
+    # worker holds its own pandas/matplotlib state, and four of them nearly
+    # fill a 1 GB Pi.
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+            else:
+                return 1
+    except (OSError, ValueError):
+        return 1
+    return max(1, min(os.cpu_count() or 1, available // worker_memory))
+
+
+def plot_files(files, jobs):
+    # Returns the number of files that failed.
+    failed = 0
+    if jobs <= 1:
+        results = (plot_file(file) for file in files)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(args,))
+        futures = [pool.submit(plot_file, file, True) for file in files]
+        results = (future_result(future) for future in futures)
+    for file, (output, error) in zip(files, results):
+        if output:
+            print(output, end="", flush=True)
+        if error is not None:
+            failed += 1
+            print(f"Plotting {file} failed", flush=True)
+            print(error, file=sys.stderr, end="", flush=True)
+    if jobs > 1:
+        pool.shutdown()
+    return failed
+
+
+def future_result(future):
+    try:
+        return future.result()
+    except Exception:  # the worker died, e.g. out of memory
+        return None, traceback.format_exc()
+
+
 if __name__ == "__main__":
     # Create the argument parser
     parser = argparse.ArgumentParser(description="Grape 2 Plot Generator")
@@ -400,16 +736,31 @@ if __name__ == "__main__":
         help="enable creating plots in the xfer directory to be uploaded to server",
         action="store_true",
     )
+    parser.add_argument(
+        "--no-cache",
+        help="always parse the input files, don't read or write Scache",
+        dest="cache",
+        action="store_false",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="plot this many files at once in worker processes, 0 to size from free memory",
+        type=int,
+        default=1,
+    )
 
     # Parse the arguments
     args = parser.parse_args()
 
-    for file in args.filenames:
-        print("Input file:", file)
-        if "MAGTMP" in file:
-            create_mag_plot_file(file.strip())
-        else:
-            create_radio_plot_file(file.strip())
+    files = [file.strip() for file in args.filenames if file.strip()]
+    if args.cache:
+        prune_cache()
+    jobs = args.jobs if args.jobs > 0 else auto_jobs()
+    failed = plot_files(files, min(jobs, len(files)))
 
+    if failed:
+        print(f"{failed} of {len(files)} files could not be plotted")
+        sys.exit(1)
     print("Exiting python combined processing program gracefully")
     sys.exit(0)
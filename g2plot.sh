@@ -1,3 +1,4 @@
 #!/bin/bash
 echo 'Grape 2 plot files shell script'
-/bin/find /home/pi/G2DATA/SdataR* /home/pi/G2DATA/Smagtmp -type f -name "$(date -d '1 day ago' +'%Y-%m-%d')*" | /bin/python3 /home/pi/G2User/g2plot.py
+# worker processes for g2plot.py, default 0 = sized from free memory; pass a number to override
+/bin/find /home/pi/G2DATA/SdataR* /home/pi/G2DATA/Smagtmp -type f -name "$(date -d '1 day ago' +'%Y-%m-%d')*" | /bin/python3 /home/pi/G2User/g2plot.py --jobs "${1:-0}"
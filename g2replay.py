@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grape 2 record and replay of the datamon and GPS streams
+
+record captures the datamon JSON records from the datamon FIFO and the raw
+bytes from the GPS serial port, each chunk stamped with the monotonic time
+it arrived. Stop the console first (it reads the FIFO) and, for the GPS,
+the g2gps service (it owns the port). generate writes a synthetic
+recording of any length, so no station is needed at all.
+
+replay feeds a recording back through a named FIFO and the master side of
+a pty at --speed times real time (0 = as fast as the readers take it). The
+pty slave is linked at --pty, so g2gps reads it as its serial port. Start
+g2gps first with --wait, so it holds the port lock and opens the pty once
+the replay creates it, and --idle 0, so it outlives the console:
+
+    cd /home/pi/G2User
+    python3 g2gps.py -p /tmp/ttyG2 --wait 60 --idle 0 &
+    python3 G2console.py --headless --pipe /tmp/datamon.fifo --datactrlr \\
+        "python3 g2replay.py replay day.g2r --fifo /tmp/datamon.fifo --pty /tmp/ttyG2 --speed 100"
+
+The FIFO is written with blocking writes, as datactrlr does, so a slow
+reader shows up as lag. Writes to the pty never block; bytes the reader has
+not taken when the pty buffer is full are dropped and counted, as a UART
+overrun would drop them.
+
+Recording format: header "<4sHd" (b"G2RP", format, wall clock start), then
+"<dBI" (seconds since start, stream, length) and the bytes, for each chunk.
+
+Date        Version     Comments
+10-18-26    Ver 1.00    Initial commit
+"""
+import os
+import sys
+import tty
+import math
+import time
+import random
+import signal
+import struct
+import argparse
+import selectors
+from functools import reduce
+from operator import xor
+
+version = "1.00"
+
+pipe_path = "/home/pi/PSWS/Sstat/datamon.fifo"
+gps_port = "/dev/ttyS0"
+
+STREAM_DATAMON = 0
+STREAM_NMEA = 1
+stream_names = ("datamon", "nmea")
+
+file_magic = b"G2RP"
+file_format = 1
+file_header = struct.Struct("<4sHd")  # magic, format, wall clock start
+chunk_header = struct.Struct("<dBI")  # seconds since start, stream, length
+
+
+class Recording:
+    """Writer for a recording file."""
+
+    def __init__(self, path, started=None):
+        self.fd = open(path, "wb")
+        self.started = time.monotonic()
+        self.fd.write(file_header.pack(file_magic, file_format, started or time.time()))
+        self.chunks = [0, 0]
+        self.bytes = [0, 0]
+
+    def write(self, stream, data, offset=None):
+        if offset is None:
+            offset = time.monotonic() - self.started
+        self.fd.write(chunk_header.pack(offset, stream, len(data)))
+        self.fd.write(data)
+        self.chunks[stream] += 1
+        self.bytes[stream] += len(data)
+
+    def close(self):
+        self.fd.close()
+
+
+def read_recording(path):
+    """Yield (seconds since start, stream, bytes) for each chunk in path."""
+    with open(path, "rb") as fd:
+        magic, fmt, _ = file_header.unpack(fd.read(file_header.size))
+        if magic != file_magic or fmt != file_format:
+            raise ValueError(f"{path} is not a version {file_format} recording")
+        while True:
+            header = fd.read(chunk_header.size)
+            if len(header) < chunk_header.size:
+                return
+            offset, stream, length = chunk_header.unpack(header)
+            data = fd.read(length)
+            if len(data) < length:
+                return  # recording cut short
+            yield offset, stream, data
+
+
+def open_fifo(path):
+    # O_NONBLOCK so the open does not wait for datactrlr
+    return os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+
+
+def record(args):
+    # Imported here so generate and replay work without pyserial installed.
+    from serial import Serial
+
+    recording = Recording(args.output)
+    selector = selectors.DefaultSelector()
+    fifo_fd = serial = None
+    if args.fifo:
+        fifo_fd = open_fifo(args.fifo)
+        selector.register(fifo_fd, selectors.EVENT_READ, STREAM_DATAMON)
+    if args.port:
+        serial = Serial(args.port, args.baud, timeout=0)
+        selector.register(serial.fileno(), selectors.EVENT_READ, STREAM_NMEA)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    deadline = None if args.duration is None else time.monotonic() + args.duration
+    print(f"Recording to {args.output}, ctrl-c to stop")
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for key, _ in selector.select(timeout):
+                if key.data == STREAM_NMEA:
+                    data = serial.read(max(1, serial.in_waiting))
+                else:
+                    data = os.read(fifo_fd, 65536)
+                    if not data:
+                        # datactrlr closed its end; wait for the next writer
+                        selector.unregister(fifo_fd)
+                        os.close(fifo_fd)
+                        fifo_fd = open_fifo(args.fifo)
+                        selector.register(fifo_fd, selectors.EVENT_READ, STREAM_DATAMON)
+                        continue
+                if data:
+                    recording.write(key.data, data)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recording.close()
+        if fifo_fd is not None:
+            os.close(fifo_fd)
+        if serial is not None:
+            serial.close()
+    for stream, name in enumerate(stream_names):
+        print(f"{name:<8} {recording.chunks[stream]:8d} chunks {recording.bytes[stream]:10d} bytes")
+
+
+def nmea_sentence(body):
+    checksum = reduce(xor, body.encode(), 0)
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+def generate(args):
+    """Synthetic recording: one datamon record and one GSA/GGA/ZDA burst a second."""
+    rng = random.Random(args.seed)
+    started = args.start
+    recording = Recording(args.output, started)
+    freqs = [5000000.0, 10000000.0, 15000000.0]
+    ampls = [0.02, 0.03, 0.01]
+    mag = [12.0, -3.0, 45.0]
+    for second in range(int(args.hours * 3600)):
+        now = time.gmtime(started + second)
+        ts = time.strftime("%Y%m%dT%H%M%SZ", now)
+        hhmmss = time.strftime("%H%M%S", now)
+        diurnal = math.sin(2 * math.pi * second / 86400)
+        radios = ",".join(
+            f'{{"id":"R{i + 1}","beacon":"WWV{(i + 1) * 5}",'
+            f'"freq":{freqs[i] + rng.gauss(0, 0.05) + 0.5 * diurnal:.3f},'
+            f'"ampl":{ampls[i] * (1.5 + diurnal) * rng.uniform(0.8, 1.2):.6f}}}'
+            for i in range(3)
+        )
+        line = (
+            f'{{"ts":"{ts}","rver":"3.5.12","pver":"2.1.4","radios":[{radios}],'
+            f'"mver":"0.0.4","ltemp":{23.5 + 2 * diurnal:.1f},"rtemp":nan,'
+            + ",".join(f'"{axis}":{mag[i] + rng.gauss(0, 0.01):.3f}' for i, axis in enumerate("xyz"))
+            + ',"status":[]}\n'
+        )
+        recording.write(STREAM_DATAMON, line.encode(), second + 0.9)
+        burst = (
+            nmea_sentence("GPGSA,A,3,04,05,09,12,24,25,29,,,,,,1.8,1.0,1.5")
+            + nmea_sentence(f"GPGGA,{hhmmss}.00,4124.8963,N,08151.6838,W,1,07,1.0,300.0,M,-34.0,M,,")
+            + nmea_sentence(f"GPZDA,{hhmmss}.00,{now.tm_mday:02d},{now.tm_mon:02d},{now.tm_year},00,00")
+        )
+        recording.write(STREAM_NMEA, burst, second + 0.1)
+    recording.close()
+    print(f"Generated {args.hours} hours in {args.output}")
+
+
+def open_pty(link):
+    # The slave is kept open here, in raw mode, so writes to the master are
+    # not echoed or translated and do not fail before the reader opens it.
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.ttyname(slave), link)
+    return master, slave
+
+
+def replay(args):
+    if not args.fifo and not args.pty:
+        sys.exit("replay needs --fifo, --pty or both")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    fifo_fd = master = slave = None
+    if args.pty:
+        master, slave = open_pty(args.pty)
+        print(f"GPS stream on {args.pty} -> {os.ttyname(slave)}")
+    if args.fifo:
+        if not os.path.exists(args.fifo):
+            os.mkfifo(args.fifo)
+        print(f"Waiting for a reader on {args.fifo}")
+        fifo_fd = os.open(args.fifo, os.O_WRONLY)
+    written = [0, 0]
+    dropped = 0
+    max_lag = 0.0
+    started = time.monotonic()
+    span = 0.0  # recording time replayed by earlier repeats
+    try:
+        for _ in range(args.repeat):
+            last = 0.0
+            for offset, stream, data in read_recording(args.recording):
+                last = offset
+                if args.speed > 0:
+                    due = started + (span + offset) / args.speed
+                    lag = time.monotonic() - due
+                    if lag < 0:
+                        time.sleep(-lag)
+                    elif lag > max_lag:
+                        max_lag = lag
+                if stream == STREAM_DATAMON and fifo_fd is not None:
+                    os.write(fifo_fd, data)
+                elif stream == STREAM_NMEA and master is not None:
+                    try:
+                        sent = os.write(master, data)
+                    except BlockingIOError:
+                        sent = 0
+                    dropped += len(data) - sent
+                else:
+                    continue
+                written[stream] += 1
+            span += last + 1.0
+    except BrokenPipeError:
+        print("Reader closed the FIFO")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for fd in (fifo_fd, master, slave):
+            if fd is not None:
+                os.close(fd)
+        if args.pty and os.path.islink(args.pty):
+            os.remove(args.pty)
+    elapsed = time.monotonic() - started
+    print(
+        f"Replayed {written[STREAM_DATAMON]} datamon records and {written[STREAM_NMEA]} NMEA chunks"
+        f" in {elapsed:.1f} s ({span / elapsed if elapsed else 0:.0f}x real time)"
+    )
+    print(f"Largest lag behind schedule {max_lag:.3f} s, {dropped} NMEA bytes dropped")
+
+
+def info(args):
+    chunks = [0, 0]
+    size = [0, 0]
+    last = 0.0
+    for offset, stream, data in read_recording(args.recording):
+        chunks[stream] += 1
+        size[stream] += len(data)
+        last = offset
+    print(f"{args.recording}: {last:.1f} s")
+    for stream, name in enumerate(stream_names):
+        print(f"{name:<8} {chunks[stream]:8d} chunks {size[stream]:10d} bytes")
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGPIPE, signal.SIG_IGN)  # EPIPE is handled in replay
+    parser = argparse.ArgumentParser(description="Grape 2 Record and Replay")
+    parser.add_argument(
+        "-v",
+        "--version",
+        action="version",
+        version=f"%(prog)s v{version}",
+        help="show g2replay version",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("record", help="record the live datamon and GPS streams")
+    p.add_argument("output", help="recording file")
+    p.add_argument("-f", "--fifo", help="datamon FIFO, empty to skip", default=pipe_path)
+    p.add_argument("-p", "--port", help="GPS serial port, empty to skip", default=gps_port)
+    p.add_argument("-b", "--baud", help="serial baud rate", type=int, default=115200)
+    p.add_argument("-d", "--duration", help="stop after this many seconds", type=float)
+    p.set_defaults(func=record)
+
+    p = commands.add_parser("generate", help="write a synthetic recording")
+    p.add_argument("output", help="recording file")
+    p.add_argument("--hours", help="length of the recording", type=float, default=24.0)
+    p.add_argument(
+        "--start", help="UTC start, epoch seconds", type=float, default=1714521600.0
+    )
+    p.add_argument("--seed", help="random seed", type=int, default=1)
+    p.set_defaults(func=generate)
+
+    p = commands.add_parser("replay", help="replay a recording")
+    p.add_argument("recording", help="recording file")
+    p.add_argument("-f", "--fifo", help="datamon FIFO to write, created if missing")
+    p.add_argument("-p", "--pty", help="link to the pty slave for the GPS stream")
+    p.add_argument(
+        "-s", "--speed", help="times real time, 0 for no pacing", type=float, default=1.0
+    )
+    p.add_argument("-n", "--repeat", help="replay this many times", type=int, default=1)
+    p.set_defaults(func=replay)
+
+    p = commands.add_parser("info", help="summarize a recording")
+    p.add_argument("recording", help="recording file")
+    p.set_defaults(func=info)
+
+    args = parser.parse_args()
+    args.func(args)
+    sys.exit(0)
@@ -1,12 +1,9 @@
 import os
 import time
-import psutil
 import curses
 import threading
 from datetime import datetime
-from serial import Serial
-from pynmeagps import NMEAReader, NMEAMessage
-from gpsdclient import GPSDClient
+from g2gps import GPSClient
 
 gps_data = {
     "time": "00:00:00",
@@ -23,125 +20,23 @@ gps_data = {
 exited = False
 
 
-def is_process_running(process_name):
-    for process in psutil.process_iter(["pid", "name"]):
-        if process.info["name"] == process_name:
-            return True
-    return False
-
-
 def saddstr(stdscr, y, x, string):
     max_y, max_x = stdscr.getmaxyx()
     if 0 <= y < max_y and 0 <= x < max_x:
         stdscr.addstr(y, x, string)
 
 
-def count_sats(data):
-    nsats = 0
-    for index in range(1, 13):
-        svid_field = f"svid_{index:02d}"
-        value = getattr(data, svid_field)
-        if isinstance(value, int):
-            nsats += 1
-    return nsats
-
-
 def gps_reader():
-    global gps_data, exited, log
-    if not is_process_running("gpsd"):
-        port = "/dev/ttyS0"
-        baud_rate = 115200
-        sat_count_flag = True  # if True, can nsats count is valid
-
-        with Serial(port, baud_rate, timeout=None) as stream:
-            nmr = NMEAReader(stream, quitonerror=0)
-            while not exited:
-                _, parsed_data = nmr.read()
-                if parsed_data is None:
-                    continue
-
-                if "D" in gps_data["fix"] and parsed_data.msgID == "GGA":
-                    try:
-                        gps_data["lat"] = float(parsed_data.lat)
-                    except:
-                        gps_data["lat"] = 0.0
-                    try:
-                        gps_data["lon"] = float(parsed_data.lon)
-                    except:
-                        gps_data["lon"] = 0.0
-                    try:
-                        gps_data["elev"] = float(parsed_data.alt)
-                    except:
-                        gps_data["elev"] = 0.0
-                    sat_count_flag = True
-                elif parsed_data.msgID == "GSA":
-                    try:
-                        gps_data["pdop"] = float(parsed_data.PDOP)
-                    except:
-                        gps_data["pdop"] = 0.0
-                    try:
-                        gps_data["fix"] = (
-                            "0"
-                            if parsed_data.navMode == 1
-                            else str(parsed_data.navMode) + "D"
-                        )
-                    except:
-                        gps_data["fix"] = "0"
-
-                    if not sat_count_flag:
-                        continue
-                    nsats = 0
-                    while (
-                        isinstance(parsed_data, NMEAMessage)
-                        and parsed_data.msgID == "GSA"
-                    ):
-                        nsats += count_sats(parsed_data)
-                        _, parsed_data = nmr.read()
-                    if isinstance(parsed_data, NMEAMessage):
-                        gps_data["nsats"] = nsats
-                    else:
-                        sat_count_flag = False
-                elif "D" in gps_data["fix"] and parsed_data.msgID == "ZDA":
-                    try:
-                        gps_data["time"] = parsed_data.time
-                    except:
-                        gps_data["time"] = "00:00:00"
-                    try:
-                        gps_data["year"] = str(parsed_data.year)
-                    except:
-                        gps_data["year"] = "0000"
-                    try:
-                        gps_data["month"] = str(parsed_data.month)
-                    except:
-                        gps_data["month"] = "00"
-                    try:
-                        gps_data["day"] = str(parsed_data.day)
-                    except:
-                        gps_data["day"] = "00"
-                else:
-                    sat_count_flag = True
-    else:
-        with GPSDClient() as client:
-            fix_quality = 0
-            while not exited:
-                tpv_str = next(client.dict_stream(filter=["TPV"]))
-                gps_data["lat"] = tpv_str.get("lat", 0.0)
-                gps_data["lon"] = tpv_str.get("lon", 0.0)
-                gps_data["elev"] = tpv_str.get("alt", 0.0)
-                fix_quality = tpv_str.get("mode", 0)
-                if fix_quality == 2 | fix_quality == 3:
-                    gps_data["fix"] = str(fix_quality) + "D"
-                else:
-                    gps_data["fix"] = "0"
-                sky_str = next(client.dict_stream(filter=["SKY"]))
-                while sky_str.get("pdop", "n/a") == "n/a":
-                    sky_str = next(client.dict_stream(filter=["SKY"]))
-                gps_data["pdop"] = sky_str.get("pdop", 0.0)
-                gps_data["nsats"] = sky_str.get("uSat", 0)
+    global gps_data
+    with GPSClient() as gps:
+        while not exited:
+            snapshot = gps.read(timeout=0.5)
+            if snapshot is not None:
+                gps_data = snapshot
 
 
 def print_title(stdscr):
-    saddstr(stdscr, 0, 19, "Grape2 GPS Diagnostic v1.1")
+    saddstr(stdscr, 0, 19, "Grape2 GPS Diagnostic v1.2")
     nextrow = 1
     return nextrow
 
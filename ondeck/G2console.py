@@ -1,23 +1,35 @@
 import argparse
 import os
 import re
+import math
+import locale
+import struct
 import json
+import signal
+import asyncio
 import time
 import psutil
 import curses
+import select
+import queue
 import threading
 import sys
+import gzip
+import shutil
 import atexit
+import shlex
 import subprocess
 from subprocess import PIPE, DEVNULL
-from datetime import datetime
-from collections import deque
-from serial import Serial
-from pynmeagps import NMEAReader, NMEAMessage
-from gpsdclient import GPSDClient
+from datetime import datetime, timezone
+from collections import namedtuple
+from types import MappingProxyType
+from array import array
+import numpy as np
+from g2gps import GPSClient
+from g2flags import CommandFlags
 
 console_name = "Grape2 Console"
-version = "12.19"
+version = "12.37"
 
 # Constants for modes
 MODE_DAILY = 0
@@ -25,302 +37,1340 @@ MODE_HOURLY = 1
 
 
 class DailyMinMaxCollection:
+    """Rolling 24 hour min/max of one channel, kept as a ring of hourly buckets.
+
+    MAX and MIN are the values with the largest and smallest absolute value.
+    The daily extremes are updated with every sample and the ring is only
+    rescanned when a new hour starts, so reading the values for a UI refresh
+    is constant time.
+
+    pack() and unpack() save and restore the ring so the 24 hour window
+    survives a console restart (see save_checkpoint/load_checkpoint).
+    """
+
+    __slots__ = (
+        "max_elements",
+        "maxs",
+        "mins",
+        "head",
+        "count",
+        "hour",
+        "daily_max",
+        "daily_min",
+        "snapshots",
+    )
+
+    # hour of the current bucket, head, count, current value
+    packed_header = struct.Struct("<11shhd")
+
     def __init__(self, max_elements=24):
         self.max_elements = max_elements
-        self.collection = deque(maxlen=max_elements)
+        self.maxs = array("d", bytes(8 * max_elements))
+        self.mins = array("d", bytes(8 * max_elements))
+        self.head = -1  # index of the current hour's bucket
+        self.count = 0
+        self.hour = None  # "YYYYMMDDTHH" of the current bucket
+        self.daily_max = None
+        self.daily_min = None
+        # (max, current, min) indexed by MODE_DAILY / MODE_HOURLY
+        self.snapshots = ((None, None, None), (None, None, None))
 
     def update_bounds(self, current_value, timestamp):
-        if timestamp[11:15] == "0000" or len(self.collection) == 0:
-            hour_data = {
-                "max": current_value,
-                "current": current_value,
-                "min": current_value,
-            }
-            self.collection.append(hour_data)
+        if timestamp[11:15] == "0000" or self.hour is None:
+            self.hour = timestamp[:11]
+            self.head = head = (self.head + 1) % self.max_elements
+            self.maxs[head] = hour_max = current_value
+            self.mins[head] = hour_min = current_value
+            if self.count < self.max_elements:
+                self.count += 1
+            self.rescan()
         else:
-            self.collection[-1]["current"] = current_value
-            if abs(current_value) > abs(self.collection[-1]["max"]):
-                self.collection[-1]["max"] = current_value
-            if abs(current_value) < abs(self.collection[-1]["min"]):
-                self.collection[-1]["min"] = current_value
+            head = self.head
+            hour_max = self.maxs[head]
+            hour_min = self.mins[head]
+            abs_value = abs(current_value)
+            if abs_value > abs(hour_max):
+                self.maxs[head] = hour_max = current_value
+                if abs_value > abs(self.daily_max):
+                    self.daily_max = current_value
+            elif abs_value < abs(hour_min):
+                self.mins[head] = hour_min = current_value
+                if abs_value < abs(self.daily_min):
+                    self.daily_min = current_value
+        self.snapshots = (
+            (self.daily_max, current_value, self.daily_min),
+            (hour_max, current_value, hour_min),
+        )
 
-    def get_daily_max(self, mode):
-        if not self.collection:
-            return None
-
-        if mode == MODE_DAILY:
-            return max(
-                (
-                    (hour_data["max"], abs(hour_data["max"]))
-                    for hour_data in self.collection
-                ),
-                key=lambda x: x[1],
-            )[0]
+    def rescan(self):
+        # Recompute the daily extremes, oldest hour first, after an hour was
+        # added or dropped out of the window.
+        first = (self.head - self.count + 1) % self.max_elements
+        daily_max = daily_min = None
+        for n in range(self.count):
+            i = (first + n) % self.max_elements
+            if daily_max is None or abs(self.maxs[i]) > abs(daily_max):
+                daily_max = self.maxs[i]
+            if daily_min is None or abs(self.mins[i]) < abs(daily_min):
+                daily_min = self.mins[i]
+        self.daily_max = daily_max
+        self.daily_min = daily_min
+
+    def pack(self):
+        current = self.get_current()
+        return (
+            self.packed_header.pack(
+                (self.hour or "").encode(),
+                self.head,
+                self.count,
+                math.nan if current is None else current,
+            )
+            + self.maxs.tobytes()
+            + self.mins.tobytes()
+        )
+
+    def packed_size(self):
+        return self.packed_header.size + 16 * self.max_elements
+
+    def unpack(self, buffer, offset, now):
+        """Restore the ring packed at buffer[offset:], aged to the UTC hour now.
+
+        Hours that have left the 24 hour window are dropped. If the hour has
+        changed the next sample starts a new bucket. Returns False, leaving
+        the collection empty, if nothing in the checkpoint is still current.
+        """
+        hour, head, count, current = self.packed_header.unpack_from(buffer, offset)
+        offset += self.packed_header.size
+        try:
+            hour = hour.decode()
+            start = datetime.strptime(hour, "%Y%m%dT%H").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return False
+        elapsed = int((now - start).total_seconds() // 3600)
+        if not 0 <= elapsed < self.max_elements or not 0 < count <= self.max_elements:
+            return False
+        self.maxs = array("d", buffer[offset : offset + 8 * self.max_elements])
+        offset += 8 * self.max_elements
+        self.mins = array("d", buffer[offset : offset + 8 * self.max_elements])
+        self.head = head
+        if elapsed == 0:
+            self.count = count
+            self.hour = hour
         else:
-            return self.collection[-1]["max"]
+            self.count = min(count, self.max_elements - elapsed)
+            self.hour = None
+            current = math.nan
+        self.rescan()
+        current = current if math.isfinite(current) else None
+        hour_max, hour_min = (
+            (self.maxs[head], self.mins[head]) if self.hour is not None else (None, None)
+        )
+        self.snapshots = (
+            (self.daily_max, current, self.daily_min),
+            (hour_max, current, hour_min),
+        )
+        return True
+
+    def get_snapshot(self, mode):
+        """Return (max, current, min) for mode, all None before the first sample."""
+        return self.snapshots[mode]
+
+    def get_daily_max(self, mode):
+        return self.snapshots[mode][0]
 
     def get_daily_min(self, mode):
-        if not self.collection:
-            return None
-
-        if mode == MODE_DAILY:
-            return min(
-                (
-                    (hour_data["min"], abs(hour_data["min"]))
-                    for hour_data in self.collection
-                ),
-                key=lambda x: x[1],
-            )[0]
-        else:
-            return self.collection[-1]["min"]
+        return self.snapshots[mode][2]
 
     def get_current(self):
-        if not self.collection:
-            return None
-        return self.collection[-1]["current"]
+        return self.snapshots[MODE_DAILY][1]
 
     def __repr__(self):
-        return f"HourlyMinMaxCollection={list(self.collection)}"
+        first = (self.head - self.count + 1) % self.max_elements
+        hours = [
+            (self.maxs[(first + n) % self.max_elements], self.mins[(first + n) % self.max_elements])
+            for n in range(self.count)
+        ]
+        return f"HourlyMinMaxCollection(current={self.get_current()}, (max, min)={hours})"
+
+
+class RollingStats:
+    """Rolling 1 and 24 hour mean, variance and slope of one channel.
+
+    Each hourly bucket holds Welford accumulators for the value and for the
+    time of each sample, plus their co-moment, so a sample costs O(1). When a
+    new hour starts the closed hours are merged once (Chan et al.) and a read
+    only has to merge that with the current hour. Buckets start on the same
+    timestamps as DailyMinMaxCollection's.
+    """
+
+    __slots__ = ("max_elements", "buckets", "head", "count", "hour", "closed")
+
+    # per bucket: n, mean of value, M2 of value, mean of time, M2 of time, co-moment
+    empty = (0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+    def __init__(self, max_elements=24):
+        self.max_elements = max_elements
+        self.buckets = [list(self.empty) for _ in range(max_elements)]
+        self.head = -1
+        self.count = 0
+        self.hour = None
+        self.closed = self.empty  # merged buckets other than the head
+
+    def update(self, value, seconds, timestamp):
+        if timestamp[11:15] == "0000" or self.hour is None:
+            self.hour = timestamp[:11]
+            self.head = (self.head + 1) % self.max_elements
+            if self.count < self.max_elements:
+                self.count += 1
+            self.buckets[self.head] = [0, 0.0, 0.0, 0.0, 0.0, 0.0]
+            self.closed = self.merge_closed()
+        bucket = self.buckets[self.head]
+        n = bucket[0] = bucket[0] + 1
+        dt = seconds - bucket[3]
+        bucket[3] += dt / n
+        dv = value - bucket[1]
+        bucket[1] += dv / n
+        bucket[2] += dv * (value - bucket[1])
+        bucket[4] += dt * (seconds - bucket[3])
+        bucket[5] += dt * (value - bucket[1])
+
+    @staticmethod
+    def merge(a, b):
+        if a[0] == 0:
+            return tuple(b)
+        if b[0] == 0:
+            return tuple(a)
+        n = a[0] + b[0]
+        dv = b[1] - a[1]
+        dt = b[3] - a[3]
+        weight = a[0] * b[0] / n
+        return (
+            n,
+            a[1] + dv * b[0] / n,
+            a[2] + b[2] + dv * dv * weight,
+            a[3] + dt * b[0] / n,
+            a[4] + b[4] + dt * dt * weight,
+            a[5] + b[5] + dt * dv * weight,
+        )
+
+    def merge_closed(self):
+        merged = self.empty
+        for n in range(1, self.count):
+            merged = self.merge(merged, self.buckets[(self.head - n) % self.max_elements])
+        return merged
+
+    def get_stats(self, mode):
+        """Return (mean, variance, std, slope per hour) for mode, all None before
+        the first sample. Variance and slope need two samples."""
+        if self.hour is None:
+            return (None, None, None, None)
+        current = self.buckets[self.head]
+        n, mean, m2, _, t_m2, co_moment = (
+            self.merge(self.closed, current) if mode == MODE_DAILY else current
+        )
+        if n < 2:
+            return (mean, None, None, None)
+        variance = m2 / (n - 1)
+        slope = co_moment / t_m2 * 3600 if t_m2 > 0 else None
+        return (mean, variance, math.sqrt(variance), slope)
+
+
+class TelemetryBuffer:
+    """The last few hours of per-second readings, in fixed memory.
+
+    One row per datamon record is kept in a preallocated array('d') used as a
+    ring, so memory use does not grow with uptime. sparkline() downsamples a
+    channel to the terminal width with NumPy, using a view of the array
+    rather than a copy.
+    """
+
+    channels = (
+        "freq1", "freq2", "freq3",
+        "ampl1", "ampl2", "ampl3",
+        "x", "y", "z",
+        "ltemp", "rtemp",
+    )  # fmt: skip
+    levels = " \u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+    ascii_levels = " _.-:=+*#"
+
+    def __init__(self, hours=4):
+        self.size = hours * 3600
+        self.width = len(self.channels)
+        self.data = array("d", bytes(8 * self.size * self.width))
+        self.rows = np.frombuffer(self.data).reshape(self.size, self.width)
+        self.head = 0  # next row to write
+        self.count = 0
+
+    def append(self, record):
+        offset = self.head * self.width
+        self.data[offset : offset + self.width] = array(
+            "d", record.freq + record.ampl + (record.x, record.y, record.z, record.ltemp, record.rtemp)
+        )
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def history(self, channel):
+        """Readings of channel, oldest first (a view where possible)."""
+        column = self.rows[:, self.channels.index(channel)]
+        if self.count < self.size:
+            return column[: self.count]
+        return np.concatenate((column[self.head :], column[: self.head]))
+
+    def sparkline(self, channel, width, levels=None):
+        """channel as width characters, each the mean of an equal slice of history.
+
+        Returns (line, low, high); line is "" until there is data.
+        """
+        levels = levels or self.levels
+        values = self.history(channel)
+        if len(values) == 0 or width <= 0:
+            return "", None, None
+        if len(values) >= width:
+            values = values[len(values) % width :].reshape(width, -1)
+        else:
+            values = values.reshape(-1, 1)
+        finite = np.isfinite(values)
+        counts = finite.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(finite, values, 0.0).sum(axis=1) / counts
+        valid = counts > 0
+        if not valid.any():
+            return " " * len(means), None, None
+        low = means[valid].min()
+        high = means[valid].max()
+        span = high - low
+        scale = (len(levels) - 2) / span if span > 0 else 0.0
+        index = np.where(valid, 1 + np.round((means - low) * scale), 0).astype(int)
+        return "".join(levels[i] for i in index), float(low), float(high)
+
+
+class LatencyHistogram:
+    """Durations in power of two microsecond buckets, cheap enough for every record."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self, buckets=24):
+        self.counts = array("L", bytes(array("L").itemsize * buckets))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        usec = seconds * 1e6
+        self.counts[min(int(usec).bit_length(), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += usec
+        if usec > self.max:
+            self.max = usec
+
+    def percentile(self, fraction):
+        # upper bound, in us, of the bucket holding the given fraction
+        target = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return 1 << i
+        return 1 << (len(self.counts) - 1)
+
+    def summary(self):
+        if self.count == 0:
+            return "n=0"
+        return (
+            f"n={self.count} mean={self.total / self.count:.1f}us "
+            f"p50<={self.percentile(0.5)}us p99<={self.percentile(0.99)}us max={self.max:.1f}us"
+        )
+
+
+class HotPathStats:
+    """Counters for the console hot paths: datamon record rate and timestamp
+    gaps, parse, aggregation and frame render latency, and GPS update rate.
+
+    Totals are kept since startup; rates are over the last report interval.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.records = 0
+        self.gps_updates = 0
+        self.gaps = 0  # times the ts sequence skipped one or more seconds
+        self.missing = 0  # seconds missing from the ts sequence
+        self.max_gap = 0
+        self.backwards = 0  # repeated or out of order ts
+        self.last_seconds = None
+        self.parse = LatencyHistogram()
+        self.aggregation = LatencyHistogram()
+        self.render = LatencyHistogram()
+        self.reported = (self.started, 0, 0)  # time, records, gps_updates
+
+    def record(self, seconds):
+        self.records += 1
+        if self.last_seconds is not None:
+            step = seconds - self.last_seconds
+            if step > 1:
+                self.gaps += 1
+                self.missing += step - 1
+                if step - 1 > self.max_gap:
+                    self.max_gap = step - 1
+            elif step < 1:
+                self.backwards += 1
+        self.last_seconds = seconds
+
+    def report(self):
+        now = time.monotonic()
+        then, records, gps_updates = self.reported
+        elapsed = max(now - then, 1e-9)
+        return [
+            f"Uptime {now - self.started:.0f} s, since last report {elapsed:.0f} s",
+            f"Records     {self.records} total, {(self.records - records) / elapsed:.2f}/s",
+            f"ts gaps     {self.gaps} gaps, {self.missing:.0f} s missing, "
+            f"longest {self.max_gap:.0f} s, {self.backwards} repeated/backwards",
+            f"Parse       {self.parse.summary()}",
+            f"Aggregate   {self.aggregation.summary()}",
+            f"Render      {self.render.summary()}",
+            f"GPS         {self.gps_updates} updates, {(self.gps_updates - gps_updates) / elapsed:.2f}/s",
+        ]
+
+    def write(self, path):
+        lines = self.report()
+        self.reported = (time.monotonic(), self.records, self.gps_updates)
+        try:
+            with open(path + ".tmp", "w") as file:
+                file.write(time.strftime("%Y-%m-%dT%H:%M:%SZ ", time.gmtime()) + version + "\n")
+                file.write("\n".join(lines) + "\n")
+            os.replace(path + ".tmp", path)
+        except OSError as ex:
+            log.write_repeated("Exception in HotPathStats.write: " + str(ex))
+
+
+class ProcessTracker:
+    """Watches a process found by name without rescanning the process table.
+
+    One psutil scan resolves the PID. After that the process is watched with
+    a pidfd, or /proc/<pid>/comm where pidfd_open is not available. A full
+    scan is repeated at most every rescan_interval seconds while the process
+    is not running.
+    """
+
+    def __init__(self, process_name, rescan_interval=5.0):
+        self.process_name = process_name
+        self.rescan_interval = rescan_interval
+        self.pid = None
+        self.pidfd = None
+        self.last_scan = None
+
+    def scan(self):
+        self.last_scan = time.monotonic()
+        for process in psutil.process_iter(["pid", "name"]):
+            if process.info["name"] == self.process_name and self.track(process.info["pid"]):
+                return True
+        return False
+
+    def track(self, pid):
+        try:
+            self.pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return False  # exited since the scan
+        except (AttributeError, OSError):
+            self.pidfd = None
+        self.pid = pid
+        return True
+
+    def forget(self):
+        if self.pidfd is not None:
+            os.close(self.pidfd)
+        self.pid = None
+        self.pidfd = None
+
+    def alive(self):
+        if self.pidfd is not None:
+            # a pidfd becomes readable when the process exits
+            return not select.select([self.pidfd], [], [], 0)[0]
+        try:
+            with open(f"/proc/{self.pid}/comm") as file:
+                return file.read().strip() == self.process_name[:15]
+        except OSError:
+            return False
+
+    def is_running(self):
+        if self.pid is not None:
+            if self.alive():
+                return True
+            self.forget()
+        if self.last_scan is not None and time.monotonic() - self.last_scan < self.rescan_interval:
+            return False
+        return self.scan()
+
+
+def utc_day(seconds):
+    return int(seconds // 86400)
+
+
+def seconds_to_midnight():
+    return 86400 - time.time() % 86400
+
+
+def compress_file(path, chunk_size=1 << 16):
+    """gzip path to path.gz and remove path, returning the compressed size.
+
+    The file is compressed to path.gz.tmp first, so an interrupted run leaves
+    path intact. If path.gz already exists the new data is appended to it as
+    a second gzip member, which gunzip and zcat read as one stream.
+    """
+    tmp_path = path + ".gz.tmp"
+    gz_path = path + ".gz"
+    with open(path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, chunk_size)
+    if os.path.exists(gz_path):
+        with open(tmp_path, "rb") as src, open(gz_path, "ab") as dst:
+            shutil.copyfileobj(src, dst, chunk_size)
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, gz_path)
+    os.remove(path)
+    return os.path.getsize(gz_path)
 
 
 class console_log:
+    """console.log writer: lines are queued and written by a background thread,
+    and the log is rotated at UTC midnight and gzipped in the background."""
 
     global node_num
 
-    def __init__(self, log_path, log_file):
+    def __init__(
+        self,
+        log_path,
+        log_file,
+        flush_interval=1.0,
+        flush_lines=100,
+        summary_interval=60.0,
+        queue_size=1000,
+        command_timeout=10.0,
+    ):
         self.log_path = log_path
         self.log_file = log_file
         self.log_full_path = None
         self.fd = None
         self.rotate_flag = False
-        self.rotate_time = "00:00:00"
+        self.day = None  # UTC day number of the first line in the log
+        self.compress_queue = queue.Queue()
+        self.compressor = None
+        self.flush_interval = flush_interval
+        self.flush_lines = flush_lines
+        self.summary_interval = summary_interval
+        self.command_timeout = command_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.dropped = 0
+        self.errors = 0  # failed writes not yet reported
+        self.last_error = None
+        self.repeats = {}  # message -> occurrences not yet written
+        self.repeats_lock = threading.Lock()
+        self.stamp = (None, "")  # (second, "%Y-%m-%d %H:%M:%S " prefix)
 
     def open(self):
         if not os.path.exists(self.log_path):
             os.makedirs(self.log_path)
         self.log_full_path = os.path.join(self.log_path, self.log_file)
+        try:
+            self.day = utc_day(os.path.getmtime(self.log_full_path))
+        except OSError:
+            self.day = utc_day(time.time())
         self.fd = open(self.log_full_path, "a")
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.writer, daemon=True)
+            self.thread.start()
+        # finish any compression interrupted by an exit or power loss
+        for file_name in sorted(os.listdir(self.log_path)):
+            if file_name.endswith("_" + self.log_file):
+                self.compress_later(os.path.join(self.log_path, file_name))
 
     def close(self):
-        if self.fd is not None:
+        if self.thread is not None:
+            if self.command("close"):
+                self.thread.join(self.command_timeout)
+            self.thread = None
+        elif self.fd is not None:
             self.fd.close()
             self.fd = None
 
+    def timestamp(self):
+        second = int(time.time())
+        stamp = self.stamp
+        if stamp[0] != second:
+            stamp = (second, time.strftime("%Y-%m-%d %H:%M:%S ", time.localtime(second)))
+            self.stamp = stamp
+        return stamp[1]
+
     def write(self, str):
-        self.fd.write(datetime.now().strftime("%Y-%m-%d %H:%M:%S ") + str + "\n")
-        self.fd.flush()
+        # only formats and queues the line; a full queue drops it and counts
+        try:
+            self.queue.put_nowait(self.timestamp() + str + "\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def write_repeated(self, str, detail=None):
+        # Log str (and detail) on its first occurrence, then only count it.
+        with self.repeats_lock:
+            count = self.repeats.get(str)
+            self.repeats[str] = 0 if count is None else count + 1
+        if count is None:
+            self.write(str)
+            if detail is not None:
+                self.write(detail)
+
+    def command(self, name):
+        # Commands run after everything queued before them. Returns False if
+        # the writer did not finish it within command_timeout seconds.
+        done = threading.Event()
+        deadline = time.monotonic() + self.command_timeout
+        try:
+            self.queue.put((name, done), timeout=self.command_timeout)
+        except queue.Full:
+            return False
+        while not done.wait(0.5):
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                return False
+        return True
 
     def flush(self):
-        if self.fd is not None:
-            self.fd.flush()
+        if self.thread is not None:
+            self.command("flush")
 
     def rotate(self):
+        if self.thread is not None:
+            self.command("rotate")
+        else:
+            self.rotate_file()
+        self.rotate_flag = False
+
+    def rotation_due(self):
+        # checked by ConsoleCore.start_rotation; at startup too, so a log last
+        # written on an earlier day is rotated straight away
+        return self.day is not None and utc_day(time.time()) > self.day
+
+    def rotate_file(self):
+        self.day = utc_day(time.time())
         if os.path.exists(self.log_full_path):
             log_rotate_path = os.path.join(
                 self.log_path,
                 datetime.now().strftime("%Y-%m-%dT000000Z_") + f"{node_num}_{self.log_file}"
                 )
-            self.close()
             os.rename(self.log_full_path, log_rotate_path)
+            fd, self.fd = self.fd, None  # reopened by write_lines if open() fails
+            try:
+                if fd is not None:
+                    fd.close()
+            finally:
+                self.compress_later(log_rotate_path)
+                self.fd = open(self.log_full_path, "a")
+                self.fd.write(self.timestamp() + f"{console_name} v{version} file {self.log_file} rotated\n")
+
+    def compress_later(self, path):
+        if self.compressor is None:
+            self.compressor = threading.Thread(target=self.compress_files, daemon=True)
+            self.compressor.start()
+        self.compress_queue.put(path)
+
+    def compress_files(self):
+        # SCHED_IDLE (or nice 19) for this thread only: gzip gets the cores
+        # and the SD card when datactrlr and the UI leave them idle.
+        tid = threading.get_native_id()
+        try:
+            os.sched_setscheduler(tid, os.SCHED_IDLE, os.sched_param(0))
+        except (AttributeError, OSError):
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, 19)
+            except (AttributeError, OSError):
+                pass
+        while True:
+            path = self.compress_queue.get()
+            started = time.monotonic()
+            try:
+                size = compress_file(path)
+            except OSError as ex:
+                self.write(f"Could not compress {path}: {ex}")
+                continue
+            self.write(
+                f"Compressed {os.path.basename(path)} to {size} bytes"
+                f" in {time.monotonic() - started:.1f} s"
+            )
+
+    def summarize(self):
+        with self.repeats_lock:
+            repeats = self.repeats
+            self.repeats = {}
+        lines = [
+            self.timestamp() + f"{message} ({count + 1} occurrences)\n"
+            for message, count in repeats.items()
+            if count > 0
+        ]
+        if self.dropped:
+            lines.append(self.timestamp() + f"{self.dropped} log messages dropped\n")
+            self.dropped = 0
+        if self.errors:
+            lines.append(self.timestamp() + f"{self.errors} log write errors, last: {self.last_error}\n")
+            self.errors = 0
+        return lines
+
+    def failed(self, ex, lines=0):
+        self.errors += 1
+        self.last_error = ex
+        self.dropped += lines
+
+    def write_lines(self, lines):
+        try:
+            if self.fd is None:
+                self.fd = open(self.log_full_path, "a")
+            self.fd.write("".join(lines))
+            self.fd.flush()
+        except OSError as ex:
+            self.failed(ex, len(lines))
+
+    def writer(self):
+        # Writes the queue in batches, every flush_interval seconds or
+        # flush_lines lines. A failed write, fsync or rotation (a full or
+        # unplugged disk) drops that batch and is counted in the next
+        # summary; the thread keeps running.
+        pending = []
+        last_flush = last_summary = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            done = None
+            if isinstance(item, str):
+                pending.append(item)
+                # take whatever else is already queued in the same batch
+                while len(pending) < self.flush_lines:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if not isinstance(item, str):
+                        break
+                    pending.append(item)
+            if isinstance(item, tuple):
+                item, done = item
+            now = time.monotonic()
+            if item == "close" or item == "rotate" or now - last_summary >= self.summary_interval:
+                pending += self.summarize()
+                last_summary = now
+            if pending and (
+                done is not None
+                or len(pending) >= self.flush_lines
+                or now - last_flush >= self.flush_interval
+            ):
+                self.write_lines(pending)
+                pending = []
+                last_flush = now
+            elif not pending:
+                last_flush = now
+            if done is None:
+                continue
+            if item != "flush" and self.fd is not None:
+                try:
+                    os.fsync(self.fd.fileno())
+                except OSError as ex:
+                    self.failed(ex)
+            try:
+                if item == "rotate":
+                    self.rotate_file()
+                    self.fd.flush()
+                elif item == "close" and self.fd is not None:
+                    self.fd.close()  # closes even when the final flush fails
+            except OSError as ex:
+                self.failed(ex)
+            if item == "close":
+                self.fd = None
+                done.set()
+                return
+            done.set()
+
+
+class DatamonReader:
+    """Reader for the datamon FIFO written by datactrlr, run by the asyncio loop.
+
+    The FIFO is opened with O_NONBLOCK and watched with loop.add_reader, so
+    complete records are passed to on_records as soon as they arrive. When
+    the writer closes its end the FIFO is reopened and the reader waits for
+    the next writer, which keeps the console running across datactrlr
+    restarts. A freshly opened FIFO does not report EOF until a writer has
+    come and gone, so the wait costs nothing.
+    """
+
+    def __init__(self, path, on_records, max_record=4096, retry_interval=0.5):
+        self.path = path
+        self.on_records = on_records
+        self.max_record = max_record  # longest record accepted, in bytes
+        self.retry_interval = retry_interval
+        self.loop = None
+        self.fd = None
+        self.retry = None  # pending open() while the FIFO does not exist
+        self.buffer = bytearray()
+        self.closed_at = None  # monotonic time the writer went away
+        self.reconnects = 0
+
+    def start(self, loop):
+        self.loop = loop
+        self.open()
+
+    def open(self):
+        self.retry = None
+        try:
+            self.fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        except FileNotFoundError:
+            # datactrlr has not created the FIFO yet
+            self.retry = self.loop.call_later(self.retry_interval, self.open)
+            return
+        self.loop.add_reader(self.fd, self.readable)
+
+    def close(self):
+        if self.retry is not None:
+            self.retry.cancel()
+            self.retry = None
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+        self.buffer.clear()
+
+    def readable(self):
+        try:
+            chunk = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return
+        if not chunk:
+            if self.closed_at is None:
+                self.closed_at = time.monotonic()
+                log.write("Datamon pipe closed, waiting for datactrlr")
+            self.close()
             self.open()
-            self.write(f"{console_name} v{version} file {self.log_file} rotated")
-        self.rotate_flag = False
+            return
+        if self.closed_at is not None:
+            self.reconnects += 1
+            log.write(
+                f"Datamon pipe reconnected after {time.monotonic() - self.closed_at:.3f} s"
+            )
+            self.closed_at = None
+
+        self.buffer += chunk
+        end = self.buffer.rfind(b"\n")
+        records = []
+        if end >= 0:
+            records = self.buffer[:end].decode(errors="replace").split("\n")
+            del self.buffer[: end + 1]
+        if len(self.buffer) > self.max_record:
+            log.write(f"Datamon record exceeds {self.max_record} bytes, discarded")
+            self.buffer.clear()
+        if records:
+            self.on_records(records)
+
+
+class DatamonRecord:
+    """Typed fields of one datamon record.
+
+    freq, ampl and beacon hold one entry per radio. Numeric fields that
+    datactrlr reports as nan, inf or null are stored as float("nan").
+    """
+
+    __slots__ = (
+        "ts",
+        "rver",
+        "pver",
+        "mver",
+        "beacon",
+        "freq",
+        "ampl",
+        "ltemp",
+        "rtemp",
+        "x",
+        "y",
+        "z",
+        "status",
+    )
+
+    def __init__(self):
+        self.ts = ""
+        self.rver = ""
+        self.pver = ""
+        self.mver = ""
+        self.beacon = ("", "", "")
+        self.freq = (math.nan, math.nan, math.nan)
+        self.ampl = (math.nan, math.nan, math.nan)
+        self.ltemp = math.nan
+        self.rtemp = math.nan
+        self.x = math.nan
+        self.y = math.nan
+        self.z = math.nan
+        self.status = ""
+
+    def __repr__(self):
+        return "DatamonRecord(" + ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        ) + ")"
+
+
+# Record layout written by datactrlr; the whole record is matched in one pass.
+_datamon_num = r'([^,}\]]*)'
+_datamon_radio = (
+    r'\{"id":"[^"]*","beacon":"([^"]*)","freq":'
+    + _datamon_num
+    + r',"ampl":'
+    + _datamon_num
+    + r"\}"
+)
+_datamon_layout = re.compile(
+    r'\{"ts":"([^"]*)","rver":"([^"]*)","pver":"([^"]*)","radios":\['
+    + ",".join([_datamon_radio] * 3)
+    + r'\],"mver":"([^"]*)","ltemp":'
+    + _datamon_num
+    + r',"rtemp":'
+    + _datamon_num
+    + r',"x":'
+    + _datamon_num
+    + r',"y":'
+    + _datamon_num
+    + r',"z":'
+    + _datamon_num
+    + r',"status":\[(.*)\]\}$'
+)
+# Fallback for records that do not follow the layout above, e.g. status-only
+# records or records without magnetometer fields.
+_datamon_token = re.compile(r'"(\w+)":\s*("[^"]*"|\[[^{]*\](?=\s*\}\s*$)|[^,}\]\s\[{"]+)')
+
+
+def _datamon_float(token):
+    try:
+        value = float(token)
+    except ValueError:
+        return math.nan  # null or garbage
+    return value if math.isfinite(value) else math.nan
+
+
+def _datamon_inf(line):
+    # inf as printed by datactrlr or Python; such records take the slow path
+    return "inf" in line or "INF" in line or "Inf" in line
+
+
+def decode_datamon(line):
+    """Decode one datamon record into a DatamonRecord.
+
+    Non-finite tokens (nan, -nan, inf, null) are accepted without a second
+    decoding pass. Raises ValueError if the line is not a datamon record.
+    """
+    record = DatamonRecord()
+    match = _datamon_layout.match(line)
+    if match is not None:
+        (
+            record.ts,
+            record.rver,
+            record.pver,
+            beacon1,
+            freq1,
+            ampl1,
+            beacon2,
+            freq2,
+            ampl2,
+            beacon3,
+            freq3,
+            ampl3,
+            record.mver,
+            ltemp,
+            rtemp,
+            x,
+            y,
+            z,
+            record.status,
+        ) = match.groups()
+        record.beacon = (beacon1, beacon2, beacon3)
+        try:
+            if _datamon_inf(line):
+                raise ValueError("inf is stored as nan")
+            record.freq = (float(freq1), float(freq2), float(freq3))
+            record.ampl = (float(ampl1), float(ampl2), float(ampl3))
+            record.ltemp = float(ltemp)
+            record.rtemp = float(rtemp)
+            record.x = float(x)
+            record.y = float(y)
+            record.z = float(z)
+        except ValueError:
+            record.freq = tuple(map(_datamon_float, (freq1, freq2, freq3)))
+            record.ampl = tuple(map(_datamon_float, (ampl1, ampl2, ampl3)))
+            record.ltemp = _datamon_float(ltemp)
+            record.rtemp = _datamon_float(rtemp)
+            record.x = _datamon_float(x)
+            record.y = _datamon_float(y)
+            record.z = _datamon_float(z)
+        return record
+
+    tokens = _datamon_token.findall(line)
+    if not tokens:
+        raise ValueError("not a datamon record")
+    beacon, freq, ampl = [], [], []
+    for key, value in tokens:
+        if key == "freq":
+            freq.append(_datamon_float(value))
+        elif key == "ampl":
+            ampl.append(_datamon_float(value))
+        elif key == "beacon":
+            beacon.append(value.strip('"'))
+        elif key == "status":
+            record.status = value[1:-1]
+        elif key in ("ltemp", "rtemp", "x", "y", "z"):
+            setattr(record, key, _datamon_float(value))
+        elif key in ("ts", "rver", "pver", "mver"):
+            setattr(record, key, value.strip('"'))
+    if record.ts != "":
+        if len(freq) != 3 or len(ampl) != 3 or len(beacon) != 3:
+            raise ValueError("datamon record does not contain 3 radios")
+        record.beacon = tuple(beacon)
+        record.freq = tuple(freq)
+        record.ampl = tuple(ampl)
+    return record
 
 
 freqs = [DailyMinMaxCollection() for _ in range(3)]
 ampls = [DailyMinMaxCollection() for _ in range(3)]
 mag = [DailyMinMaxCollection() for _ in range(3)]
-last_data = ""
-gps_data = {
-    "time": "00:00:00",
-    "day": "00",
-    "month": "00",
-    "year": "0000",
-    "lat": 0.0,
-    "lon": 0.0,
-    "elev": 0.0,
-    "pdop": 0.0,
-    "fix": "0",
-    "nsats": 0,
-}
-exited = False
+freq_stats = [RollingStats() for _ in range(3)]
+ampl_stats = [RollingStats() for _ in range(3)]
+mag_stats = [RollingStats() for _ in range(3)]
+telemetry = TelemetryBuffer()
+hot_stats = HotPathStats()
+hot_stats_path = "/home/pi/PSWS/Sstat/console.stat"
+hot_stats_interval = 60.0  # seconds between stats file updates
+# Ctrl-d cycles the panel: the readings alone, with the trends or with the
+# console stats. Below the readings when the terminal is tall enough, in
+# place of them in the standard 59x39 terminal.
+PANEL_READINGS = 0
+PANEL_TRENDS = 1
+PANEL_STATS = 2
+panel = PANEL_READINGS
+checkpoint_path = "/home/pi/PSWS/Sstat/minmax.ckpt"
+checkpoint_interval = 300.0  # seconds between checkpoints while running
+checkpoint_header = struct.Struct("<4sHHH")  # magic, format, collections, hours
+log_rotate_check = 300.0  # longest wait between checks for UTC midnight
+gps_retry_min = 2.0  # seconds before reconnecting to the GPS service
+gps_retry_max = 60.0
+ts_day = ("", 0.0)  # date of the last timestamp and its epoch seconds
+show_stats = False  # Ctrl-t shows mean/std/slope instead of max/current/min
+sparkline_interval = 5.0  # seconds between trend redraws
+sparkline_unicode = False  # block characters need a UTF-8 terminal
+sparkline_precision = {"freq": 3, "ampl": 6, "ltem": 1, "rtem": 1}
+# Latest datamon record and GPS snapshot. Both are replaced, never modified,
+# so a reader always sees a consistent pair.
+ConsoleState = namedtuple("ConsoleState", ["data", "gps"])
+state = ConsoleState(
+    None,
+    MappingProxyType(
+        {
+            "time": "00:00:00",
+            "day": "00",
+            "month": "00",
+            "year": "0000",
+            "lat": 0.0,
+            "lon": 0.0,
+            "elev": 0.0,
+            "pdop": 0.0,
+            "fix": "0",
+            "nsats": 0,
+        }
+    ),
+)
+KEY_INTERRUPT = -2  # queued by ConsoleCore for SIGINT/SIGTERM
+screen_cells = {}  # (y, x) -> text last written by saddstr
 mode = MODE_DAILY
 datactrlr = None
+datactrlr_cmd = ["sudo", "/home/pi/G2User/datactrlr", "-l"]
 node_num = ""
 
 
 def saddstr(stdscr, y, x, string):
+    # Only cells whose text changed since the last frame are written.
+    if screen_cells.get((y, x)) == string:
+        return
     max_y, max_x = stdscr.getmaxyx()
     if 0 <= y < max_y and 0 <= x < max_x:
         stdscr.addstr(y, x, string)
+        screen_cells[(y, x)] = string
 
 
-def data_reader():
-    global last_data
-    with open(pipe_path) as fifo:
-        for line in fifo:
-            if exited:
-                break
-            try:
-                last_data = parse_json(line)
-            except Exception as ex:
-                log.write("Exception in data_reader: " + str(ex))
-                log.write(line.replace("\0", ""))
-
-
-def count_sats(data):
-    nsats = 0
-    for index in range(1, 13):
-        svid_field = f"svid_{index:02d}"
-        value = getattr(data, svid_field)
-        if isinstance(value, int):
-            nsats += 1
-    return nsats
-
-
-def is_process_running(process_name):
-    for process in psutil.process_iter(["pid", "name"]):
-        if process.info["name"] == process_name:
-            return True
-    return False
-
+def save_checkpoint(path):
+    # Renamed into place so a crash never leaves a partial checkpoint.
+    collections = freqs + ampls + mag
+    data = checkpoint_header.pack(
+        b"G2MM", 1, len(collections), collections[0].max_elements
+    ) + b"".join(c.pack() for c in collections)
+    try:
+        with open(path + ".tmp", "wb") as file:
+            file.write(data)
+        os.replace(path + ".tmp", path)
+    except OSError as ex:
+        log.write_repeated("Exception in save_checkpoint: " + str(ex))
 
-def gps_reader():
-    global gps_data, exited, log
-    if not is_process_running("gpsd"):
-        port = "/dev/ttyS0"
-        baud_rate = 115200
-        sat_count_flag = True  # if True, can nsats count is valid
 
-        with Serial(port, baud_rate, timeout=None) as stream:
-            nmr = NMEAReader(stream, quitonerror=0)
-            while not exited:
-                _, parsed_data = nmr.read()
-                if not isinstance(parsed_data, NMEAMessage):
+def load_checkpoint(path):
+    collections = freqs + ampls + mag
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, form, number, hours = checkpoint_header.unpack_from(data)
+    except (OSError, struct.error):
+        return
+    size = collections[0].packed_size()
+    if (
+        (magic, form, number, hours) != (b"G2MM", 1, len(collections), collections[0].max_elements)
+        or len(data) != checkpoint_header.size + number * size
+    ):
+        log.write("Ignoring min/max checkpoint from another version")
+        return
+    now = datetime.now(timezone.utc)
+    restored = 0
+    for i, collection in enumerate(collections):
+        restored += collection.unpack(data, checkpoint_header.size + i * size, now)
+    log.write(f"Restored min/max history for {restored} of {number} channels")
+
+
+class ConsoleCore:
+    """asyncio core shared by the curses console and headless mode.
+
+    One event loop multiplexes the datamon FIFO, the GPS service socket,
+    stdin, the command flag directory and the periodic timers, so nothing
+    polls and no reader thread competes for the Pi's cores. Readers publish
+    a new ConsoleState and queue a wakeup; keys are queued as they are read.
+    The UI awaits next_event() and redraws from state. close() removes every
+    reader and timer in a fixed order and writes the final checkpoint.
+    """
+
+    def __init__(self, loop, stdscr=None):
+        self.loop = loop
+        self.stdscr = stdscr
+        self.events = asyncio.Queue()
+        self.wake_pending = False
+        self.handles = []  # timers, cancelled by close()
+        self.readers = []  # fds passed to loop.add_reader
+        self.datamon = DatamonReader(pipe_path, self.records)
+        self.gps = GPSClient()
+        self.gps_fd = None
+        self.gps_task = None
+        self.gps_retry = gps_retry_min  # doubles while the service keeps failing
+
+    def start_input(self):
+        # keys, command flags and a one second clock tick
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(signum, self.events.put_nowait, KEY_INTERRUPT)
+        if self.stdscr is not None:
+            self.add_reader(sys.stdin.fileno(), self.keys)
+        if cmd_flags.fileno() is not None:
+            self.add_reader(cmd_flags.fileno(), self.flags)
+        self.every(1.0, self.wake)
+
+    def start_readers(self):
+        load_checkpoint(checkpoint_path)
+        self.datamon.start(self.loop)
+        self.gps_task = self.loop.create_task(self.connect_gps())
+        self.every(checkpoint_interval, lambda: save_checkpoint(checkpoint_path))
+        self.every(hot_stats_interval, lambda: hot_stats.write(hot_stats_path))
+        self.start_rotation()
+
+    async def close(self):
+        for handle in self.handles:
+            handle.cancel()
+        if self.gps_task is not None:
+            self.gps_task.cancel()
+        for fd in self.readers:
+            self.loop.remove_reader(fd)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.loop.remove_signal_handler(signum)
+        if self.datamon.loop is not None:
+            self.datamon.close()
+            save_checkpoint(checkpoint_path)
+        self.gps.close()
+
+    def add_reader(self, fd, callback):
+        self.loop.add_reader(fd, callback)
+        self.readers.append(fd)
+
+    def remove_reader(self, fd):
+        self.loop.remove_reader(fd)
+        self.readers.remove(fd)
+
+    def every(self, interval, func):
+        index = len(self.handles)
+
+        def tick():
+            self.handles[index] = self.loop.call_later(interval, tick)
+            func()
+
+        self.handles.append(self.loop.call_later(interval, tick))
+
+    def start_rotation(self):
+        # A monotonic timer armed for the next UTC midnight. The day is
+        # checked against the wall clock whenever it fires, and it fires at
+        # least every log_rotate_check seconds, so a clock set late by GPS or
+        # NTP moves the rotation by minutes at most and a day is never missed.
+        index = len(self.handles)
+
+        def check():
+            if log.rotation_due():
+                log.rotate_flag = True
+                self.wake()
+            delay = min(seconds_to_midnight(), log_rotate_check)
+            self.handles[index] = self.loop.call_later(delay, check)
+
+        self.handles.append(self.loop.call_soon(check))
+
+    def wake(self):
+        # at most one wakeup is queued; keys are queued separately
+        if not self.wake_pending:
+            self.wake_pending = True
+            self.events.put_nowait(None)
+
+    async def next_event(self):
+        """Wait for a key, returned as a curses key code (or KEY_INTERRUPT), or
+        for new data or a clock tick, returned as None."""
+        event = await self.events.get()
+        if event is None:
+            self.wake_pending = False
+        return event
+
+    def keys(self):
+        while True:
+            char = self.stdscr.getch()
+            if char == curses.ERR:
+                return
+            self.events.put_nowait(char)
+
+    def flags(self):
+        fd = cmd_flags.fileno()
+        cmd_flags.update()
+        if cmd_flags.fileno() != fd:
+            self.remove_reader(fd)  # watch lost, CommandFlags polls on the tick
+        self.wake()
+
+    def records(self, lines):
+        global state
+        record = None
+        for line in lines:
+            try:
+                parsed = parse_json(line)
+            except Exception as ex:
+                log.write_repeated("Exception in data_reader: " + str(ex), line.replace("\0", ""))
+                continue
+            if parsed is not None:
+                record = parsed
+        if record is not None:
+            state = state._replace(data=record)
+            self.wake()
+
+    async def connect_gps(self):
+        # Snapshots come from the shared GPS service (g2gps.py), which owns
+        # /dev/ttyS0 or the gpsd connection and is started here if needed.
+        # A service that can't open the port is retried with backoff rather
+        # than restarted every few seconds.
+        while True:
+            try:
+                await self.loop.run_in_executor(None, self.gps.connect)
+            except ConnectionError as ex:
+                log.write_repeated("Exception in gps_reader: " + str(ex))
+                await self.gps_backoff()
+                continue
+            self.gps_fd = self.gps.fileno()
+            self.add_reader(self.gps_fd, self.gps_readable)
+            return
+
+    def gps_readable(self):
+        global state
+        snapshot = None
+        try:
+            while True:
+                try:
+                    latest = self.gps.read(timeout=0)
+                except ValueError as ex:
+                    # a corrupted line is skipped; the next snapshot is whole
+                    log.write_repeated("Bad GPS service line: " + str(ex))
                     continue
+                if latest is None:
+                    break
+                snapshot = latest
+                hot_stats.gps_updates += 1
+        except ConnectionError as ex:
+            log.write_repeated("Exception in gps_reader: " + str(ex))
+            self.remove_reader(self.gps_fd)
+            self.gps_task = self.loop.create_task(self.reconnect_gps())
+        if snapshot is None:
+            return
+        self.gps_retry = gps_retry_min
+        del snapshot["seen"]
+        state = state._replace(gps=MappingProxyType(snapshot))
+        self.wake()
+
+    async def gps_backoff(self):
+        await asyncio.sleep(self.gps_retry)
+        self.gps_retry = min(self.gps_retry * 2, gps_retry_max)
+
+    async def reconnect_gps(self):
+        await self.gps_backoff()
+        await self.connect_gps()
+
+
+def run_loop(main_coroutine, core):
+    # Run the UI or headless loop, then shut the core down in order.
+    loop = core.loop
+    try:
+        return loop.run_until_complete(main_coroutine)
+    finally:
+        loop.run_until_complete(core.close())
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
 
-                try:
-                    if "D" in gps_data["fix"] and parsed_data.msgID == "GGA":
-                        try:
-                            gps_data["lat"] = float(parsed_data.lat)
-                        except:
-                            gps_data["lat"] = 0.0
-                        try:
-                            gps_data["lon"] = float(parsed_data.lon)
-                        except:
-                            gps_data["lon"] = 0.0
-                        try:
-                            gps_data["elev"] = float(parsed_data.alt)
-                        except:
-                            gps_data["elev"] = 0.0
-                        sat_count_flag = True
-                    elif parsed_data.msgID == "GSA":
-                        try:
-                            gps_data["pdop"] = float(parsed_data.PDOP)
-                        except:
-                            gps_data["pdop"] = 0.0
-                        try:
-                            gps_data["fix"] = (
-                                "0"
-                                if parsed_data.navMode == 1
-                                else str(parsed_data.navMode) + "D"
-                            )
-                        except:
-                            gps_data["fix"] = "0"
-
-                        if not sat_count_flag:
-                            continue
-                        nsats = 0
-                        while (
-                            isinstance(parsed_data, NMEAMessage)
-                            and parsed_data.msgID == "GSA"
-                        ):
-                            nsats += count_sats(parsed_data)
-                            _, parsed_data = nmr.read()
-                        if isinstance(parsed_data, NMEAMessage):
-                            gps_data["nsats"] = nsats
-                        else:
-                            sat_count_flag = False
-                    elif "D" in gps_data["fix"] and parsed_data.msgID == "ZDA":
-                        try:
-                            gps_data["time"] = str(parsed_data.time)
-                            if gps_data["time"] == log.rotate_time:
-                                log.rotate_flag = True
-                        except:
-                            gps_data["time"] = "00:00:00"
-                        try:
-                            gps_data["year"] = str(parsed_data.year)
-                        except:
-                            gps_data["year"] = "0000"
-                        try:
-                            gps_data["month"] = str(parsed_data.month)
-                        except:
-                            gps_data["month"] = "00"
-                        try:
-                            gps_data["day"] = str(parsed_data.day)
-                        except:
-                            gps_data["day"] = "00"
-                    else:
-                        sat_count_flag = True
-                except Exception as ex:
-                    log.write("Exception in gps_reader: " + str(ex))
-                    log.write(f'"{parsed_data=}"')
 
-    else:
-        # TEST: need more testing
-        with GPSDClient() as client:
-            fix_quality = 0
-            while not exited:
-                tpv_str = next(client.dict_stream(filter=["TPV"]))
-                gps_data["lat"] = tpv_str.get("lat", 0.0)
-                gps_data["lon"] = tpv_str.get("lon", 0.0)
-                gps_data["elev"] = tpv_str.get("alt", 0.0)
-                fix_quality = tpv_str.get("mode", 0)
-                if fix_quality == 2 | fix_quality == 3:
-                    gps_data["fix"] = str(fix_quality) + "D"
-                else:
-                    gps_data["fix"] = "0"
-                sky_str = next(client.dict_stream(filter=["SKY"]))
-                while sky_str.get("pdop", "n/a") == "n/a":
-                    sky_str = next(client.dict_stream(filter=["SKY"]))
-                gps_data["pdop"] = sky_str.get("pdop", 0.0)
-                gps_data["nsats"] = sky_str.get("uSat", 0)
+def ts_seconds(ts):
+    # "YYYYMMDDTHHMMSSZ" to seconds since the epoch; the date part is only
+    # converted once a day.
+    global ts_day
+    if ts[:8] != ts_day[0]:
+        day = datetime.strptime(ts[:8], "%Y%m%d").replace(tzinfo=timezone.utc)
+        ts_day = (ts[:8], day.timestamp())
+    return ts_day[1] + int(ts[9:11]) * 3600 + int(ts[11:13]) * 60 + int(ts[13:15])
 
 
 def parse_json(line):
+    line = line.strip().replace("\0", "")
+    if len(line) <= 10:
+        return None
+    started = time.perf_counter()
     try:
-        line = line.strip().replace("\0", "")
-        data = json.loads(
-            line,
-            parse_float=lambda x: x,
-            parse_int=lambda x: x,
-            parse_constant=lambda x: x,
-        )
-        for i in range(3):
-            current_ampl = float(data["radios"][i]["ampl"])
-            ampls[i].update_bounds(current_ampl, data["ts"])
-            current_freq = float(data["radios"][i]["freq"])
-            freqs[i].update_bounds(current_freq, data["ts"])
-        for i, axis in enumerate(["x", "y", "z"]):
-            current_axis_val = float(data[axis])
-            mag[i].update_bounds(current_axis_val, data["ts"])
-        return data
-    except Exception as ex:
-        if len(line) > 10:
-            log.write("Exception in parse_json: " + str(ex))
-            log.write(repr(line) + "\n")
-            regex_pattern = r"(-?nan|-?inf|null)"
-            replacement = "0.0"
-
-            line = re.sub(regex_pattern, replacement, line)
-            return json.loads(
-                line,
-                parse_float=lambda x: x,
-                parse_int=lambda x: x,
-                parse_constant=lambda x: x,
-            )
-        else:
-            return ""
+        record = decode_datamon(line)
+    except ValueError as ex:
+        log.write_repeated("Exception in parse_json: " + str(ex), repr(line))
+        return None
+    if record.ts == "":
+        # status-only record, e.g. GPS sync lost
+        log.write_repeated("Datamon status: " + record.status)
+        return None
+    decoded = time.perf_counter()
+    hot_stats.parse.add(decoded - started)
+    ts = record.ts
+    seconds = ts_seconds(ts)
+    hot_stats.record(seconds)
+    for i in range(3):
+        if math.isfinite(record.ampl[i]):
+            ampls[i].update_bounds(record.ampl[i], ts)
+            ampl_stats[i].update(record.ampl[i], seconds, ts)
+        if math.isfinite(record.freq[i]):
+            freqs[i].update_bounds(record.freq[i], ts)
+            freq_stats[i].update(record.freq[i], seconds, ts)
+    for i, value in enumerate((record.x, record.y, record.z)):
+        if math.isfinite(value):
+            mag[i].update_bounds(value, ts)
+            mag_stats[i].update(value, seconds, ts)
+    telemetry.append(record)
+    hot_stats.aggregation.add(time.perf_counter() - decoded)
+    return record
 
 
 def print_title(stdscr):
@@ -343,7 +1393,7 @@ def print_version_widget(stdscr, row):
 def print_version(stdscr, row, data):
     versions = [("RasPi", "rver"), ("Pico", "pver")]
     for i, (label, key) in enumerate(versions):
-        ver_string = data[key]
+        ver_string = getattr(data, key)
         elements = ver_string.split(".")
         elements[-1] = elements[-1].rjust(2, "0")
         saddstr(stdscr, row + 1 + i, 32, ".".join(elements))
@@ -353,7 +1403,7 @@ def log_versions(data):
     versions = [("datactrlr", "rver"), ("picorun", "pver"), ("magdata", "mver")]
     ver_string = datetime.now().strftime("%m/%d/%Y %H:%M:%S") + " Versions: G2console " + f"{version} "
     for i, (label, key) in enumerate(versions):
-        ver = data.get(key)     # returns "None" if missing (avoids exception)
+        ver = getattr(data, key)
         if ver == "":
             ver = "None"
         ver_string += label + " " + ver + " "
@@ -371,6 +1421,7 @@ def print_datetime_widget(stdscr, row):
 
 
 def print_gps_time(stdscr, row):
+    gps_data = state.gps
     saddstr(
         stdscr,
         row + 1,
@@ -395,6 +1446,7 @@ def print_gps_widget(stdscr, row):
 
 
 def print_gps(stdscr, row):
+    gps_data = state.gps
     saddstr(stdscr, row + 2, 18, gps_data["fix"].ljust(2))
     saddstr(stdscr, row + 2, 28, str(gps_data["nsats"]).ljust(2))
     saddstr(stdscr, row + 2, 36, str(gps_data["pdop"]))
@@ -413,8 +1465,7 @@ def print_beacon_widget(stdscr, row):
 
 def print_beacon(stdscr, row, data):
     for i in range(3):
-        # BUG: line 234 TypeError: string indices must be integers
-        saddstr(stdscr, row + 2, 18 + 15 * i, data["radios"][i]["beacon"].ljust(5))
+        saddstr(stdscr, row + 2, 18 + 15 * i, data.beacon[i].ljust(5))
 
 
 def print_ampl_widget(stdscr, row):
@@ -422,33 +1473,38 @@ def print_ampl_widget(stdscr, row):
     saddstr(stdscr, row + 1, 18, "Vpeak")
     saddstr(stdscr, row + 1, 33, "Vpeak")
     saddstr(stdscr, row + 1, 48, "Vpeak")
-    saddstr(stdscr, row + 3, 0, "Current")
     return row + 5
 
 
+def format_bounds(collection, stats, precision):
+    # (max, current, min) strings for the current mode, or (mean, std,
+    # slope/hr) with show_stats; "" until there is a value
+    if show_stats:
+        mean, _, std, slope = stats.get_stats(mode)
+        values = (mean, std, slope)
+    else:
+        values = collection.get_snapshot(mode)
+    return ["" if value is None else f"{value:.{precision}f}" for value in values]
+
+
+def print_bounds_labels(stdscr, row):
+    # labels of the max/current/min rows, which start at row
+    hours = "24 hr" if mode == MODE_DAILY else "1 hr "
+    if show_stats:
+        labels = (f"MEAN {hours}", f"STD {hours} ", f"SLOPE/hr {hours}")
+    else:
+        labels = (f"MAX {hours}", "Current", f"MIN {hours}")
+    for i, label in enumerate(labels):
+        saddstr(stdscr, row + i, 0, label.ljust(14))
+
+
 def print_ampl(stdscr, row):
     for i in range(3):
-        if ampls[i].get_daily_max(mode) != None:
-            max_str_value = "{0:.6f}".format(ampls[i].get_daily_max(mode))
-        else:
-            max_str_value = ""
-        if ampls[i].get_daily_min(mode) != None:
-            min_str_value = "{0:.6f}".format(ampls[i].get_daily_min(mode))
-        else:
-            min_str_value = ""
-        if ampls[i].get_current() != None:
-            curr_str_value = "{0:.6f}".format(ampls[i].get_current())
-        else:
-            curr_str_value = ""
+        max_str_value, curr_str_value, min_str_value = format_bounds(ampls[i], ampl_stats[i], 6)
         saddstr(stdscr, row + 2, 17 + 15 * i, max_str_value.rjust(8))
         saddstr(stdscr, row + 3, 17 + 15 * i, curr_str_value.rjust(8))
         saddstr(stdscr, row + 4, 17 + 15 * i, min_str_value.rjust(8))
-    if mode == MODE_DAILY:
-        saddstr(stdscr, row + 2, 0, "MAX 24 hr")
-        saddstr(stdscr, row + 4, 0, "MIN 24 hr")
-    else:
-        saddstr(stdscr, row + 2, 0, "MAX 1 hr ")
-        saddstr(stdscr, row + 4, 0, "MIN 1 hr ")
+    print_bounds_labels(stdscr, row + 2)
 
 
 def print_freq_widget(stdscr, row):
@@ -456,33 +1512,16 @@ def print_freq_widget(stdscr, row):
     saddstr(stdscr, row + 1, 20, "Hz")
     saddstr(stdscr, row + 1, 35, "Hz")
     saddstr(stdscr, row + 1, 50, "Hz")
-    saddstr(stdscr, row + 3, 0, "Current")
     return row + 5
 
 
 def print_freq(stdscr, row):
     for i in range(3):
-        if freqs[i].get_daily_max(mode) != None:
-            max_str_value = "{0:.3f}".format(freqs[i].get_daily_max(mode))
-        else:
-            max_str_value = ""
-        if freqs[i].get_daily_min(mode) != None:
-            min_str_value = "{0:.3f}".format(freqs[i].get_daily_min(mode))
-        else:
-            min_str_value = ""
-        if freqs[i].get_current() != None:
-            curr_str_value = "{0:.3f}".format(freqs[i].get_current())
-        else:
-            curr_str_value = ""
+        max_str_value, curr_str_value, min_str_value = format_bounds(freqs[i], freq_stats[i], 3)
         saddstr(stdscr, row + 2, 15 + 15 * i, max_str_value.rjust(12))
         saddstr(stdscr, row + 3, 15 + 15 * i, curr_str_value.rjust(12))
         saddstr(stdscr, row + 4, 15 + 15 * i, min_str_value.rjust(12))
-    if mode == MODE_DAILY:
-        saddstr(stdscr, row + 2, 0, "MAX 24 hr")
-        saddstr(stdscr, row + 4, 0, "MIN 24 hr")
-    else:
-        saddstr(stdscr, row + 2, 0, "MAX 1 hr ")
-        saddstr(stdscr, row + 4, 0, "MIN 1 hr ")
+    print_bounds_labels(stdscr, row + 2)
     # log.write("")
     # log.write(freqs.__repr__())
 
@@ -495,8 +1534,8 @@ def print_temp_widget(stdscr, row):
 
 
 def print_temp(stdscr, row, data):
-    saddstr(stdscr, row + 2, 17, data["ltemp"].ljust(5))
-    saddstr(stdscr, row + 2, 32, data["rtemp"].ljust(5))
+    saddstr(stdscr, row + 2, 17, "{0:.1f}".format(data.ltemp).ljust(5))
+    saddstr(stdscr, row + 2, 32, "{0:.1f}".format(data.rtemp).ljust(5))
 
 
 def print_mag_widget(stdscr, row):
@@ -505,57 +1544,98 @@ def print_mag_widget(stdscr, row):
     saddstr(stdscr, row + 2, 17, "X(uT)")
     saddstr(stdscr, row + 2, 32, "Y(uT)")
     saddstr(stdscr, row + 2, 47, "Z(uT)")
-    saddstr(stdscr, row + 4, 0, "Current")
     return row + 6
 
 
 def print_mag(stdscr, row):
-    for i, axis in enumerate(["x", "y", "z"]):
-        if mag[i].get_daily_max(mode) != None:
-            max_str_value = "{0:.3f}".format(mag[i].get_daily_max(mode))
-        else:
-            max_str_value = ""
-        if mag[i].get_daily_min(mode) != None:
-            min_str_value = "{0:.3f}".format(mag[i].get_daily_min(mode))
-        else:
-            min_str_value = ""
-        if mag[i].get_current() != None:
-            curr_str_value = "{0:.3f}".format(mag[i].get_current())
-        else:
-            curr_str_value = ""
+    for i in range(3):
+        max_str_value, curr_str_value, min_str_value = format_bounds(mag[i], mag_stats[i], 3)
         saddstr(stdscr, row + 3, 15 + 15 * i, max_str_value.rjust(8))
         saddstr(stdscr, row + 4, 15 + 15 * i, curr_str_value.rjust(8))
         saddstr(stdscr, row + 5, 15 + 15 * i, min_str_value.rjust(8))
-    if mode == MODE_DAILY:
-        saddstr(stdscr, row + 3, 0, "MAX 24 hr")
-        saddstr(stdscr, row + 5, 0, "MIN 24 hr")
-    else:
-        saddstr(stdscr, row + 3, 0, "MAX 1 hr ")
-        saddstr(stdscr, row + 5, 0, "MIN 1 hr ")
+    print_bounds_labels(stdscr, row + 3)
+
+
+def print_sparklines(stdscr, row):
+    # Trend of every channel over the telemetry buffer, one line each
+    rows, cols = stdscr.getmaxyx()
+    levels = TelemetryBuffer.levels if sparkline_unicode else TelemetryBuffer.ascii_levels
+    width = cols - 30
+    hours = telemetry.count / 3600
+    saddstr(stdscr, row, 0, f"Trend, last {hours:.1f} hr".ljust(24))
+    for i, channel in enumerate(TelemetryBuffer.channels):
+        line, low, high = telemetry.sparkline(channel, width, levels)
+        precision = sparkline_precision.get(channel[:4], 3)
+        bounds = "" if low is None else f"{low:.{precision}f}..{high:.{precision}f}"
+        saddstr(stdscr, row + 1 + i, 0, channel)
+        saddstr(stdscr, row + 1 + i, 7, line.ljust(width))
+        saddstr(stdscr, row + 1 + i, 8 + width, bounds[: cols - 9 - width].ljust(cols - 9 - width))
+
+
+def print_hot_stats(stdscr, row):
+    saddstr(stdscr, row, 0, "Console stats".ljust(24))
+    cols = stdscr.getmaxyx()[1]
+    for i, line in enumerate(hot_stats.report()):
+        saddstr(stdscr, row + 1 + i, 0, line[: cols - 1].ljust(cols - 1))
+
+
+def clear_rows(stdscr, top, bottom):
+    # blank rows top to bottom - 1 and forget their cached cells, e.g. when
+    # the panel changes
+    for row in range(top, min(bottom, stdscr.getmaxyx()[0])):
+        stdscr.move(row, 0)
+        stdscr.clrtoeol()
+    for cell in [cell for cell in screen_cells if top <= cell[0] < bottom]:
+        del screen_cells[cell]
 
 
 def print_status(stdscr, row, data):
-    stat = str(data["status"]).strip("[]")
+    stat = data.status
     if stat != "":
         saddstr(stdscr, row, 6, stat)
     else:
         saddstr(stdscr, row, 6, "                                                        ")
 
 
+def start_datactrlr():
+    global datactrlr
+    log.write("Starting datactrlr")
+    datactrlr = subprocess.Popen(
+        datactrlr_cmd,
+        stdin=PIPE,
+        stdout=DEVNULL,
+        stderr=DEVNULL,
+    )
+
+    datactrlr.stdin.write(b"r\n")
+    datactrlr.stdin.flush()
+    time.sleep(0.1)
+
+
+def kill_datactrlr(tracker):
+    # Terminate a datactrlr left running by an earlier console.
+    log.write("Terminating running datactrlr")
+    subprocess.Popen(["sudo", "killall", tracker.process_name], stdin=PIPE, stdout=DEVNULL, stderr=DEVNULL)
+    time.sleep(2.0)
+
+
 def stop_datactrlr():
     global datactrlr
     if datactrlr is not None:
-        datactrlr.stdin.write(b"\x1b")
-        datactrlr.stdin.flush()
-        time.sleep(0.1)
-        datactrlr.stdin.write(b"q\n")
-        datactrlr.stdin.flush()
-        time.sleep(0.1)
+        try:
+            datactrlr.stdin.write(b"\x1b")
+            datactrlr.stdin.flush()
+            time.sleep(0.1)
+            datactrlr.stdin.write(b"q\n")
+            datactrlr.stdin.flush()
+            time.sleep(0.1)
+        except BrokenPipeError:
+            pass  # datactrlr already exited
         datactrlr = None
 
 
 def check_restart(stdscr, position):
-    if os.path.exists(restart_path):
+    if cmd_flags.is_set("restartcon"):
         saddstr(
             stdscr,
             position,
@@ -563,16 +1643,20 @@ def check_restart(stdscr, position):
             "Restarting the Console for updates...              ",
         )
         stdscr.refresh()
-        os.remove(restart_path)
+        cmd_flags.clear("restartcon")
         return True
 
     return False
 
 
 def update_ui(stdscr):
-    global mode, exited, datactrlr
+    core = ConsoleCore(asyncio.new_event_loop(), stdscr)
+    return run_loop(console_loop(stdscr, core), core)
+
+
+async def console_loop(stdscr, core):
+    global mode, show_stats, panel
     log_vers = True
-    # TODO: do NOT terminate statmon on pipe close
     end_of_title = print_title(stdscr)
     end_of_version = print_version_widget(stdscr, end_of_title)
     end_of_datetime = print_datetime_widget(stdscr, end_of_version)
@@ -583,16 +1667,26 @@ def update_ui(stdscr):
     end_of_temp = print_temp_widget(stdscr, end_of_freq)
     end_of_mag = print_mag_widget(stdscr, end_of_temp)
     saddstr(
-        stdscr, end_of_mag + 2, 6, "<ctrl-p> = toggle for 1Hr/24Hr Min/Max            "
+        stdscr, end_of_mag + 2, 6, "<ctrl-p> = 1Hr/24Hr  <ctrl-t> = Min/Max, Mean/Std  "
     )
+    saddstr(
+        stdscr, end_of_mag + 3, 6, "<ctrl-d> = show readings, trends or console stats "
+    )
+    # the panel goes below the key help if it fits, else over the readings
+    panel_below = stdscr.getmaxyx()[0] > end_of_mag + 5 + len(TelemetryBuffer.channels)
+    if panel_below:
+        panel_top, panel_bottom = end_of_mag + 5, stdscr.getmaxyx()[0]
+        panel = PANEL_TRENDS
+    else:
+        panel_top, panel_bottom = end_of_beacon, end_of_mag
 
     exit_code = 0
-    program_name = "datactrlr"
+    stdscr.nodelay(True)
+    core.start_input()
+    tracker = ProcessTracker("datactrlr")
     while datactrlr is None:
-        if is_process_running(program_name):
-            log.write(f"Terminating running {program_name}")
-            kproc = subprocess.Popen( ["sudo", "killall", program_name], stdin=PIPE, stdout=DEVNULL, stderr=DEVNULL)
-            time.sleep(2.0)
+        if tracker.is_running():
+            kill_datactrlr(tracker)
         else:
             saddstr(
                 stdscr,
@@ -602,8 +1696,10 @@ def update_ui(stdscr):
             )
             stdscr.refresh()
 
-            char = stdscr.getch()
-            if (char != curses.ERR and char == 114) or (args.autorun):  # statmon detected r
+            char = None if args.autorun else await core.next_event()
+            if char == KEY_INTERRUPT:
+                return exit_code
+            if char == 114 or args.autorun:  # statmon detected r
                 saddstr(
                     stdscr,
                     end_of_mag + 1,
@@ -611,20 +1707,8 @@ def update_ui(stdscr):
                     "Starting the Data Controller...                ",
                 )
                 stdscr.refresh()
-
-                log.write(f"Starting {program_name}")
-                datactrlr = subprocess.Popen(
-                    ["sudo", "/home/pi/G2User/datactrlr", "-l"],
-                    stdin=PIPE,
-                    stdout=DEVNULL,
-                    stderr=DEVNULL,
-                )
-
-                datactrlr.stdin.write(b"r\n")
-                datactrlr.stdin.flush()
-                time.sleep(0.1)
+                start_datactrlr()
             elif check_restart(stdscr, end_of_mag + 1):
-                exited = True
                 exit_code = 6
                 return exit_code
 
@@ -635,74 +1719,247 @@ def update_ui(stdscr):
         "<ctrl-x> = terminate Data Controller              ",
     )
 
-    data_reader_thread = threading.Thread(target=data_reader)
-    data_reader_thread.start()
-    gps_reader_thread = threading.Thread(target=gps_reader)
-    gps_reader_thread.start()
-    try:
-        while data_reader_thread.is_alive():
-            if last_data != "":
-                if log_vers is True:
-                    log_versions(last_data)
-                    log_vers = False
-                if log.rotate_flag is True:
-                    log.rotate()
-                print_version(stdscr, end_of_title, last_data)
-                print_gps_time(stdscr, end_of_version)
-                print_gps(stdscr, end_of_datetime)
-                print_beacon(stdscr, end_of_gps, last_data)
+    core.start_readers()
+    # what is on screen, so only widgets whose data changed are redrawn
+    drawn_data = None
+    drawn_gps = None
+    drawn_mode = None
+    drawn_trend = 0.0
+    while True:
+        if log.rotate_flag is True:
+            log.rotate()
+        frame_started = time.perf_counter()
+        data, gps = state
+        new_frame = data is not drawn_data
+        if data is not None:
+            if log_vers is True:
+                log_versions(data)
+                log_vers = False
+            if data is not drawn_data:
+                print_version(stdscr, end_of_title, data)
+                print_beacon(stdscr, end_of_gps, data)
+                #print_status(stdscr, end_of_mag + 3, data)
+            readings_shown = panel_below or panel == PANEL_READINGS
+            if readings_shown and data is not drawn_data:
+                print_temp(stdscr, end_of_freq, data)
+            if readings_shown and (data is not drawn_data or (mode, show_stats) != drawn_mode):
                 print_ampl(stdscr, end_of_beacon)
                 print_freq(stdscr, end_of_ampl)
-                print_temp(stdscr, end_of_freq, last_data)
                 print_mag(stdscr, end_of_temp)
-                #print_status(stdscr, end_of_mag + 3, last_data)
+                drawn_mode = (mode, show_stats)
+            drawn_data = data
+            if panel != PANEL_READINGS and time.monotonic() - drawn_trend >= sparkline_interval:
+                if panel == PANEL_STATS:
+                    print_hot_stats(stdscr, panel_top)
+                else:
+                    print_sparklines(stdscr, panel_top)
+                drawn_trend = time.monotonic()
+            if gps is not drawn_gps:
+                print_gps_time(stdscr, end_of_version)
+                print_gps(stdscr, end_of_datetime)
+                drawn_gps = gps
+        stdscr.noutrefresh()
+        curses.doupdate()
+        if new_frame and data is not None:
+            hot_stats.render.add(time.perf_counter() - frame_started)
+
+        if check_restart(stdscr, end_of_mag + 1):
+            # restart in Run mode only if datactrlr was still running
+            exit_code = 5 if datactrlr is not None else 6
+            stop_datactrlr()
+            break
+        char = await core.next_event()
+        if char is None:
+            continue  # new data or clock tick
+        elif char == 24:  # Detected Ctrl-x
+            log.write("Ctrl-x detected")
+            if datactrlr is not None:
+                saddstr(
+                    stdscr,
+                    end_of_mag + 1,
+                    6,
+                    "Stopping the Data Controller...                    ",
+                )
                 stdscr.refresh()
-
-                char = stdscr.getch()
-                if char != curses.ERR and char == 24:  # Detected Ctrl-x
-                    log.write("Ctrl-x detected")
-                    if datactrlr is not None:
-                        saddstr(
-                            stdscr,
-                            end_of_mag + 1,
-                            6,
-                            "Stopping the Data Controller...                    ",
-                        )
-                        stdscr.refresh()
-                        stop_datactrlr()
-                    else:
-                        saddstr(
-                            stdscr,
-                            end_of_mag + 1,
-                            6,
-                            "Terminating the Console...                         ",
-                        )
-                        stdscr.refresh()
-                        break
-                if char != curses.ERR and char == 16:  # Detected Ctrl+p
-                    mode = MODE_DAILY if mode == MODE_HOURLY else MODE_HOURLY
-                if check_restart(stdscr, end_of_mag + 1):
-                    stop_datactrlr()
-                    exit_code = 5
-                    break
+                stop_datactrlr()
+                saddstr(
+                    stdscr,
+                    end_of_mag + 1,
+                    6,
+                    "<ctrl-x> = terminate the Console                  ",
+                )
+            else:
+                saddstr(
+                    stdscr,
+                    end_of_mag + 1,
+                    6,
+                    "Terminating the Console...                         ",
+                )
                 stdscr.refresh()
-    except KeyboardInterrupt:
-        saddstr(
-            stdscr,
-            end_of_mag + 1,
-            6,
-            "Terminating the Console...                         ",
+                break
+        elif char == 16:  # Detected Ctrl+p
+            mode = MODE_DAILY if mode == MODE_HOURLY else MODE_HOURLY
+        elif char == 20:  # Detected Ctrl+t
+            show_stats = not show_stats
+        elif char == 4:  # Detected Ctrl+d
+            panel = (panel + 1) % 3
+            clear_rows(stdscr, panel_top, panel_bottom)
+            if not panel_below and panel == PANEL_READINGS:
+                print_ampl_widget(stdscr, end_of_beacon)
+                print_freq_widget(stdscr, end_of_ampl)
+                print_temp_widget(stdscr, end_of_freq)
+                print_mag_widget(stdscr, end_of_temp)
+                drawn_data = drawn_mode = None
+            drawn_trend = 0.0
+        elif char == KEY_INTERRUPT:
+            saddstr(
+                stdscr,
+                end_of_mag + 1,
+                6,
+                "Terminating the Console...                         ",
+            )
+            stdscr.refresh()
+            break
+    return exit_code
+
+
+def finite(value):
+    # JSON has no nan/inf
+    return value if value is not None and math.isfinite(value) else None
+
+
+def bounds_snapshot(collection, stats):
+    daily_max, current, daily_min = collection.get_snapshot(MODE_DAILY)
+    hourly_max, _, hourly_min = collection.get_snapshot(MODE_HOURLY)
+    snapshot = {
+        "current": finite(current),
+        "max_24hr": finite(daily_max),
+        "min_24hr": finite(daily_min),
+        "max_1hr": finite(hourly_max),
+        "min_1hr": finite(hourly_min),
+    }
+    for stats_mode, suffix in ((MODE_DAILY, "24hr"), (MODE_HOURLY, "1hr")):
+        mean, variance, std, slope = stats.get_stats(stats_mode)
+        snapshot[f"mean_{suffix}"] = finite(mean)
+        snapshot[f"variance_{suffix}"] = finite(variance)
+        snapshot[f"std_{suffix}"] = finite(std)
+        snapshot[f"slope_per_hr_{suffix}"] = finite(slope)
+    return snapshot
+
+
+def status_snapshot():
+    data, gps = state
+    snapshot = {
+        "console": version,
+        "node": node_num,
+        "datactrlr": datactrlr is not None,
+        "gps": dict(gps),
+        "console_stats": hot_stats.report(),
+        "ts": None,
+    }
+    if data is not None:
+        snapshot.update(
+            {
+                "ts": data.ts,
+                "versions": {"rver": data.rver, "pver": data.pver, "mver": data.mver},
+                "radios": [
+                    {
+                        "beacon": data.beacon[i],
+                        "freq": bounds_snapshot(freqs[i], freq_stats[i]),
+                        "ampl": bounds_snapshot(ampls[i], ampl_stats[i]),
+                    }
+                    for i in range(3)
+                ],
+                "mag": {
+                    axis: bounds_snapshot(mag[i], mag_stats[i])
+                    for i, axis in enumerate(("x", "y", "z"))
+                },
+                "ltemp": finite(data.ltemp),
+                "rtemp": finite(data.rtemp),
+                "status": data.status,
+            }
         )
-        stdscr.refresh()
+    return snapshot
+
+
+async def serve_status(reader, writer):
+    # Minimal HTTP/1.0 responder: GET / or /status returns status_snapshot().
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5.0)
+        while await asyncio.wait_for(reader.readline(), 5.0) not in (b"\r\n", b"\n", b""):
+            pass  # headers are not used
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] == b"GET" and parts[1] in (b"/", b"/status"):
+            status, content_type = "200 OK", "application/json"
+            body = json.dumps(status_snapshot()).encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not found\n"
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
     finally:
-        exited = True
-    data_reader_thread.join()
-    gps_reader_thread.join()
+        writer.close()
+
+
+def run_headless():
+    core = ConsoleCore(asyncio.new_event_loop())
+    return run_loop(headless_loop(core), core)
+
+
+async def headless_loop(core):
+    # Same ingestion, aggregation, log rotation and datactrlr supervision as
+    # the curses console, with the state served as JSON instead of drawn.
+    global datactrlr
+    exit_code = 0
+    log_vers = True
+    restart_delay = 10.0  # seconds before restarting a datactrlr that died
+
+    tracker = ProcessTracker("datactrlr")
+    if tracker.is_running():
+        kill_datactrlr(tracker)
+    start_datactrlr()
+
+    server = await asyncio.start_server(serve_status, "127.0.0.1", args.status_port)
+    log.write(f"Status available on http://127.0.0.1:{args.status_port}/status")
+    core.start_input()
+    core.start_readers()
+    died_at = None
+    try:
+        while True:
+            data = state.data
+            if data is not None:
+                if log_vers is True:
+                    log_versions(data)
+                    log_vers = False
+            if log.rotate_flag is True:
+                log.rotate()
+            if cmd_flags.is_set("restartcon"):
+                log.write("Restarting the Console for updates")
+                cmd_flags.clear("restartcon")
+                exit_code = 5
+                break
+            if datactrlr is not None and datactrlr.poll() is not None:
+                log.write(f"datactrlr exited with code {datactrlr.returncode}")
+                datactrlr = None
+                died_at = time.monotonic()
+            if datactrlr is None and time.monotonic() - died_at >= restart_delay:
+                if tracker.is_running():
+                    kill_datactrlr(tracker)
+                start_datactrlr()
+            if await core.next_event() == KEY_INTERRUPT:
+                break
+    finally:
+        stop_datactrlr()
+        server.close()
     return exit_code
 
 
 def main(stdscr):
-
     global node_num
 
     atexit.register(stop_datactrlr)
@@ -713,7 +1970,6 @@ def main(stdscr):
         node_num = file.readline().strip()
 
     curses.curs_set(0)  # hide cursor
-    curses.halfdelay(5)
     curses.init_pair(
         1, curses.COLOR_GREEN, curses.COLOR_BLACK
     )  # (color pair #, foreground, background)
@@ -737,15 +1993,54 @@ if __name__ == "__main__":
         help="show g2console version",
     )
     parser.add_argument("-r", "--autorun", help="enable autorun", action="store_true")
+    parser.add_argument(
+        "--headless",
+        help="run without curses and serve the console state as JSON",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--status-port",
+        help="localhost port for the headless status endpoint",
+        type=int,
+        default=8642,
+    )
+    parser.add_argument(
+        "--pipe",
+        help="datamon FIFO to read",
+        default="/home/pi/PSWS/Sstat/datamon.fifo",
+    )
+    parser.add_argument(
+        "--datactrlr",
+        help="command run in place of datactrlr, e.g. a g2replay.py replay",
+    )
 
     # Parse the arguments
     args = parser.parse_args()
 
-    pipe_path = "/home/pi/PSWS/Sstat/datamon.fifo"
-    restart_path = "/home/pi/PSWS/Scmd/restartcon"
+    pipe_path = args.pipe
+    if args.datactrlr:
+        datactrlr_cmd = shlex.split(args.datactrlr)
+    cmd_flags = CommandFlags("/home/pi/PSWS/Scmd")
 
     log = console_log("/home/pi/G2DATA/Slogs/", "console.log")
     log.open()
+    atexit.register(log.close)
+
+    if args.headless:
+        atexit.register(stop_datactrlr)
+        log.write(f"{console_name} v{version} started headless")
+        with open("/home/pi/PSWS/Sinfo/NodeNum.txt") as file:
+            node_num = file.readline().strip()
+        exit_code = run_headless()
+        log.write(f"Exit code is {exit_code}")
+        log.write(f"{console_name} v{version} ended\n")
+        log.close()
+        sys.exit(exit_code)
 
+    try:
+        locale.setlocale(locale.LC_ALL, "")
+        sparkline_unicode = locale.getpreferredencoding() == "UTF-8"
+    except locale.Error:
+        pass
     curses.wrapper(main)
 
@@ -0,0 +1,42 @@
+import math
+import os
+import sys
+
+sys.path[:0] = [
+    os.path.join(os.path.dirname(__file__), ".."),
+    os.path.join(os.path.dirname(__file__), "..", "ondeck"),
+]
+
+from G2console import decode_datamon  # noqa: E402
+
+RECORD = (
+    '{"ts":"20240501T120000Z","rver":"3.5.12","pver":"2.1.4","radios":['
+    '{"id":"R1","beacon":"WWV5","freq":5000000.123,"ampl":0.012345},'
+    '{"id":"R2","beacon":"WWV10","freq":10000000.5,"ampl":0.023456},'
+    '{"id":"R3","beacon":"WWV15","freq":15000000.789,"ampl":0.5}],'
+    '"mver":"0.0.4","ltemp":23.5,"rtemp":-nan,"x":12.345,"y":-3.210,"z":45.678,"status":[]}'
+)
+# the same record without the magnetometer, decoded by the token fallback
+FALLBACK = RECORD.replace(',"x":12.345,"y":-3.210,"z":45.678', "")
+
+
+def test_layout():
+    record = decode_datamon(RECORD)
+    assert record.freq == (5000000.123, 10000000.5, 15000000.789)
+    assert record.beacon == ("WWV5", "WWV10", "WWV15")
+    assert record.ltemp == 23.5 and math.isnan(record.rtemp)
+    assert (record.x, record.y, record.z) == (12.345, -3.210, 45.678)
+
+
+def test_inf_is_nan():
+    for template in (RECORD, FALLBACK):
+        line = template.replace("0.012345", "inf").replace("23.5", "-inf")
+        record = decode_datamon(line)
+        assert math.isnan(record.ampl[0]) and math.isnan(record.ltemp)
+        assert record.ampl[1:] == (0.023456, 0.5)
+        assert record.freq[0] == 5000000.123
+
+
+def test_null_is_nan():
+    record = decode_datamon(RECORD.replace("12.345", "null"))
+    assert math.isnan(record.x) and record.y == -3.210
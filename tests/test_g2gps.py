@@ -0,0 +1,67 @@
+import json
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from g2gps import GPSService, GPSStreamParser  # noqa: E402
+
+
+def read_available(sock):
+    data = b""
+    while True:
+        try:
+            chunk = sock.recv(1 << 20)
+        except BlockingIOError:
+            return data
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_short_write_drops_the_client():
+    service = GPSService(None, 115200, "/nonexistent/g2gps.sock")
+    server_end, client_end = socket.socketpair()
+    server_end.setblocking(False)
+    client_end.setblocking(False)
+    service.clients = [server_end]
+    service.snapshot["padding"] = "x" * (1 << 20)  # longer than the socket buffer
+    service.publish("GGA")
+    data = read_available(client_end)
+    del service.snapshot["padding"]
+    service.publish("GGA")  # would follow the partial line if the client were kept
+    data += read_available(client_end)
+    assert service.clients == []
+    for line in data.split(b"\n")[:-1]:
+        json.loads(line)
+
+
+def nmea(body):
+    checksum = 0
+    for char in body.encode():
+        checksum ^= char
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+def test_gga_before_fix_then_gsa_3d():
+    service = GPSService(None, 115200, "/nonexistent/g2gps.sock")
+    parser = GPSStreamParser()
+    no_fix_gga = nmea("GNGGA,123456.00,,,,,0,00,99.99,,,,,,")
+    gsa_3d = nmea("GNGSA,A,3,05,13,15,18,20,,,,,,,,1.80,0.95,1.53,1")
+    fix_gga = nmea("GNGGA,123457.00,4124.2960,N,08131.0780,W,1,08,0.95,250.0,M,-34.0,M,,")
+    for data in (no_fix_gga, gsa_3d):
+        for kind, msg_id, fields in parser.feed(data):
+            if msg_id == "GSA":
+                service.gsa(fields)
+            else:
+                service.gga(fields)
+    # a 3D fix, but the only position so far came from the GGA before it
+    assert service.snapshot["fix"] == "3D"
+    assert "GGA" in service.snapshot["seen"]
+    assert not service.snapshot["position_valid"]
+    for kind, msg_id, fields in parser.feed(fix_gga):
+        service.gga(fields)
+    assert service.snapshot["position_valid"]
+    assert abs(service.snapshot["lat"] - 41.40493) < 1e-4
+    assert abs(service.snapshot["lon"] + 81.5180) < 1e-4